@@ -5,3 +5,6 @@ class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
     verbose_name = 'Интерфейс приложения foodgram (REST)'
+
+    def ready(self):
+        from api import signals  # noqa: F401
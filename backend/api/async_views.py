@@ -0,0 +1,212 @@
+"""Асинхронные (ASGI) представления для частых запросов на чтение.
+
+Подключаются в api.urls при ASYNC_READ_API=True. Отвечают только на GET,
+остальные методы передаются синхронным вьюсетам. Ответы совпадают
+с ответами соответствующих сериализаторов, лимиты CONCURRENCY_LIMITS —
+те же, что у вьюсетов.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseRedirect
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.authentication import CachedTokenAuthentication
+from api.concurrency import get_limiter
+from api.conditional import (alist_last_modified, list_etag, not_modified,
+                             recipe_state_flags, recipe_state_queryset,
+                             recipe_validators, set_validators)
+from api.fieldsets import normalize, normalized_requested, requested_fields
+from api.pagination import KeysetPagination, RecipePagination
+from api.representations import (NORMALIZED_RECIPE_FIELDS,
+                                 RECIPE_RESPONSE_FIELDS, aload_recipes,
+                                 auser_flags, ingredient_queryset,
+                                 tag_queryset)
+from api.views import IngredientViewSet, RecipeViewSet, TagViewSet
+from foodgram_backend.db_router import can_read_from_replica, replica_reads
+from recipes.models import Recipe
+
+
+def json_response(data, status=200, headers=None):
+    return HttpResponse(
+        JSONRenderer().render(data),
+        content_type='application/json',
+        status=status,
+        headers=headers,
+    )
+
+
+def exception_response(exc):
+    """Повторяет ответ rest_framework.views.exception_handler."""
+    headers = None
+    if isinstance(exc, (exceptions.NotAuthenticated,
+                        exceptions.AuthenticationFailed)):
+        headers = {'WWW-Authenticate': CachedTokenAuthentication.keyword}
+    if getattr(exc, 'wait', None):
+        headers = {'Retry-After': '%d' % exc.wait}
+    data = exc.detail
+    if not isinstance(data, (list, dict)):
+        data = {'detail': data}
+    return json_response(data, exc.status_code, headers)
+
+
+def get_concurrency_limiter(sync_view, request):
+    """Ограничитель, которым вьюсет ограничил бы этот GET."""
+    viewset = sync_view.cls(
+        **sync_view.initkwargs,
+        action=sync_view.actions['get'],
+        request=request,
+    )
+    return get_limiter(viewset.concurrency_key(request))
+
+
+def read_path(sync_view):
+    """Обслуживает GET асинхронно, остальные методы — вьюсетом DRF."""
+    run_sync_view = sync_to_async(sync_view)
+
+    def decorator(async_view):
+        @wraps(async_view)
+        async def view(request, *args, **kwargs):
+            if request.method != 'GET':
+                return await run_sync_view(request, *args, **kwargs)
+            request = Request(
+                request, authenticators=[CachedTokenAuthentication()]
+            )
+            try:
+                # Промах кэша токенов обращается к БД синхронно.
+                await sync_to_async(lambda: request.user)()
+            except exceptions.APIException as exc:
+                return exception_response(exc)
+            limiter = get_concurrency_limiter(sync_view, request)
+            slot = None
+            token = replica_reads.set(can_read_from_replica(request.user))
+            try:
+                if limiter is not None:
+                    # Ожидание слота не должно занимать общий поток
+                    # синхронного кода.
+                    slot = await sync_to_async(
+                        limiter.acquire, thread_sensitive=False
+                    )()
+                return await async_view(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                return exception_response(exc)
+            finally:
+                if slot is not None:
+                    limiter.release(slot)
+                replica_reads.reset(token)
+        # Как и вьюсеты DRF, не требуют CSRF-токена.
+        view.csrf_exempt = True
+        return view
+    return decorator
+
+
+def filter_queryset(request, queryset, view):
+    """Фильтрует queryset так же, как вьюсет (валидация идёт в БД)."""
+    for backend in view.filter_backends:
+        queryset = backend().filter_queryset(request, queryset, view)
+    return queryset
+
+
+async def get_object(queryset, **lookup):
+    try:
+        return await queryset.aget(**lookup)
+    except queryset.model.DoesNotExist:
+        raise exceptions.NotFound()
+
+
+@read_path(TagViewSet.as_view({'get': 'list'}, basename='tags'))
+async def tag_list(request):
+    return json_response([tag async for tag in tag_queryset()])
+
+
+@read_path(TagViewSet.as_view({'get': 'retrieve'}, basename='tags'))
+async def tag_detail(request, pk):
+    return json_response(await get_object(tag_queryset(), pk=pk))
+
+
+@read_path(IngredientViewSet.as_view(
+    {'get': 'list'}, basename='ingredients'
+))
+async def ingredient_list(request):
+    queryset = await sync_to_async(filter_queryset)(
+        request, ingredient_queryset(), IngredientViewSet
+    )
+    return json_response([ingredient async for ingredient in queryset])
+
+
+@read_path(IngredientViewSet.as_view(
+    {'get': 'retrieve'}, basename='ingredients'
+))
+async def ingredient_detail(request, pk):
+    return json_response(await get_object(ingredient_queryset(), pk=pk))
+
+
+@read_path(RecipeViewSet.as_view(
+    {'get': 'list', 'post': 'create'}, basename='recipes'
+))
+async def recipe_list(request):
+    fields = requested_fields(request.query_params, RECIPE_RESPONSE_FIELDS)
+    normalized = normalized_requested(request.query_params)
+    queryset = await sync_to_async(filter_queryset)(
+        request, Recipe.objects.all(), RecipeViewSet
+    )
+    if KeysetPagination.cursor_query_param in request.query_params:
+        paginator = KeysetPagination()
+        ids = await paginator.apaginate_queryset(queryset, request)
+        count = None
+        headers = None
+    else:
+        paginator = RecipePagination()
+        ids = await paginator.apaginate_queryset(
+            queryset.values_list('id', flat=True), request
+        )
+        count = paginator.page.paginator.count
+        headers = paginator.count_headers()
+    flags = await auser_flags(request.user, ids, fields)
+    etag = list_etag(
+        request, await alist_last_modified(queryset), count, ids, flags
+    )
+    response = not_modified(request, etag)
+    if response is None:
+        recipes = await aload_recipes(ids, request, flags, fields)
+        included = {}
+        if normalized:
+            recipes, included = normalize(recipes, NORMALIZED_RECIPE_FIELDS)
+        data = paginator.get_paginated_response(recipes).data
+        data.update(included)
+        response = json_response(data, headers=headers)
+    return set_validators(response, etag)
+
+
+@read_path(RecipeViewSet.as_view({
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy'
+}, basename='recipes'))
+async def recipe_detail(request, pk):
+    fields = requested_fields(request.query_params, RECIPE_RESPONSE_FIELDS)
+    state = await recipe_state_queryset(request.user, fields).filter(
+        pk=pk
+    ).afirst()
+    if state is None:
+        raise exceptions.NotFound()
+    etag, last_modified = recipe_validators(state, fields)
+    response = not_modified(request, etag, last_modified)
+    if response is None:
+        response = json_response((await aload_recipes(
+            [pk], request, recipe_state_flags(state), fields
+        ))[0])
+    return set_validators(response, etag, last_modified)
+
+
+@read_path(RecipeViewSet.as_view(
+    {'get': 'get_short_link'}, basename='recipes'
+))
+async def recipe_short_link(request, short_link):
+    recipe = await get_object(
+        Recipe.objects.only('id'), short_link=short_link
+    )
+    return HttpResponseRedirect(f'/recipes/{recipe.pk}')
@@ -0,0 +1,129 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from copy import copy
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+SHARED_CACHE_KEY = 'auth-token:{}'
+
+
+class TokenCache:
+    """LRU-кэш токенов процесса с ограниченным временем жизни записей."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, token = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return token
+
+    def set(self, key, token):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, token)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+token_cache = TokenCache(
+    settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_CACHE_TTL
+)
+
+
+def get_shared_cache():
+    alias = settings.AUTH_TOKEN_SHARED_CACHE
+    return caches[alias] if alias else None
+
+
+def shared_cache_key(key):
+    # В общий кэш ключ токена попадает только в виде хэша.
+    return SHARED_CACHE_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def invalidate_tokens(keys):
+    """Удаляет токены из локального и общего кэша."""
+    keys = list(keys)
+    for key in keys:
+        token_cache.discard(key)
+    shared_cache = get_shared_cache()
+    if shared_cache is not None and keys:
+        shared_cache.delete_many([shared_cache_key(key) for key in keys])
+
+
+def invalidate_user_tokens(user_id):
+    invalidate_tokens(
+        Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену без обращения к БД на каждый запрос.
+
+    Пара токен/пользователь хранится в LRU-кэше процесса ограниченное время
+    (AUTH_TOKEN_CACHE_TTL) и, если задан AUTH_TOKEN_SHARED_CACHE, в общем
+    кэше для всех воркеров. Записи удаляются при выходе из системы, смене
+    пароля, деактивации и любом другом сохранении пользователя.
+    """
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            token = self.get_shared_token(key)
+        if token is None:
+            token = super().authenticate_credentials(key)[1]
+            self.set_shared_token(key, token)
+            token_cache.set(key, token)
+        if not token.user.is_active:
+            invalidate_tokens([key])
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        # Каждый запрос получает собственную копию снимка пользователя.
+        user = copy(token.user)
+        token = copy(token)
+        token.user = user
+        return (user, token)
+
+    def get_shared_token(self, key):
+        shared_cache = get_shared_cache()
+        if shared_cache is None:
+            return None
+        token = shared_cache.get(shared_cache_key(key))
+        if token is not None:
+            token_cache.set(key, token)
+        return token
+
+    def set_shared_token(self, key, token):
+        shared_cache = get_shared_cache()
+        if shared_cache is not None:
+            shared_cache.set(
+                shared_cache_key(key),
+                token,
+                settings.AUTH_TOKEN_SHARED_CACHE_TTL
+            )
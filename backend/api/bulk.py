@@ -0,0 +1,135 @@
+"""Пакетное создание рецептов (POST /api/recipes/bulk/).
+
+Каждый рецепт проверяет BulkRecipeSerializer без запросов к БД, а теги,
+ингредиенты и занятые названия — один запрос на весь пакет. Корректные
+рецепты сохраняются через bulk_create транзакциями по BULK_BATCH_SIZE;
+то, что для одиночного рецепта делают сигналы post_save, выполняется явно.
+"""
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.relations import PrimaryKeyRelatedField
+
+from api.constants import BULK_BATCH_SIZE
+from api.serializers import BulkRecipeSerializer
+from blobs.references import change_references
+from recipes.models import (Ingredient, Recipe, RecipeIngredient, RecipeTag,
+                            Tag)
+from recipes.signals import recipes_created
+from recipes.utils import tags_mask
+
+NAME_TAKEN = 'У вас уже есть рецепт с таким названием.'
+
+
+def validate_items(items, context):
+    """Проверяет рецепты по отдельности: (корректные, ошибки)."""
+    serializer = BulkRecipeSerializer(context=context)
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, serializer.run_validation(item)))
+        except ValidationError as error:
+            errors.append({'index': index, 'errors': error.detail})
+    return valid, errors
+
+
+def existing_ids(model, ids):
+    return set(model.objects.filter(id__in=ids).values_list('id', flat=True))
+
+
+def missing_errors(ids, found):
+    message = PrimaryKeyRelatedField.default_error_messages['does_not_exist']
+    return [message.format(pk_value=pk) for pk in ids if pk not in found]
+
+
+def check_references(valid, author):
+    """Теги, ингредиенты и названия всех рецептов пакета разом."""
+    tag_ids = existing_ids(
+        Tag, {tag_id for _, data in valid for tag_id in data['tags']}
+    )
+    ingredient_ids = existing_ids(Ingredient, {
+        ingredient['id']
+        for _, data in valid for ingredient in data['ingredients']
+    })
+    taken = set(Recipe.objects.filter(
+        author=author, name__in={data['name'] for _, data in valid}
+    ).values_list('name', flat=True))
+    checked, errors = [], []
+    for index, data in valid:
+        item_errors = {}
+        tags = missing_errors(data['tags'], tag_ids)
+        if tags:
+            item_errors['tags'] = tags
+        ingredients = missing_errors(
+            [ingredient['id'] for ingredient in data['ingredients']],
+            ingredient_ids
+        )
+        if ingredients:
+            item_errors['ingredients'] = ingredients
+        if data['name'] in taken:
+            item_errors['name'] = [NAME_TAKEN]
+        if item_errors:
+            errors.append({'index': index, 'errors': item_errors})
+        else:
+            # Повтор названия дальше в пакете — тоже ошибка.
+            taken.add(data['name'])
+            checked.append((index, data))
+    return checked, errors
+
+
+@transaction.atomic
+def save_batch(batch, author):
+    recipes = Recipe.objects.bulk_create([
+        Recipe(
+            author=author,
+            name=data['name'],
+            text=data['text'],
+            cooking_time=data['cooking_time'],
+            image=data['image'],
+            # bulk_create не вызывает сигналы, поэтому маска задаётся сразу.
+            tags_mask=tags_mask(data['tags']),
+        )
+        for _, data in batch
+    ])
+    RecipeTag.objects.bulk_create(
+        RecipeTag(recipe=recipe, tag_id=tag_id)
+        for recipe, (_, data) in zip(recipes, batch)
+        for tag_id in data['tags']
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(
+            recipe=recipe,
+            ingredient_id=ingredient['id'],
+            amount=ingredient['amount'],
+        )
+        for recipe, (_, data) in zip(recipes, batch)
+        for ingredient in data['ingredients']
+    )
+    change_references([recipe.image.name for recipe in recipes], 1)
+    recipes_created(recipes)
+    return [
+        {'index': index, 'id': recipe.id}
+        for recipe, (index, _) in zip(recipes, batch)
+    ]
+
+
+def create_recipes(items, author, context):
+    """Создаёт корректные рецепты из items: (созданные, ошибки)."""
+    valid, errors = validate_items(items, context)
+    checked, reference_errors = check_references(valid, author)
+    errors += reference_errors
+    created = []
+    for start in range(0, len(checked), BULK_BATCH_SIZE):
+        batch = checked[start:start + BULK_BATCH_SIZE]
+        try:
+            created += save_batch(batch, author)
+        except IntegrityError:
+            # Рецепт с тем же названием создан параллельно: по одному.
+            for item in batch:
+                try:
+                    created += save_batch([item], author)
+                except IntegrityError:
+                    errors.append(
+                        {'index': item[0], 'errors': {'name': [NAME_TAKEN]}}
+                    )
+    errors.sort(key=lambda error: error['index'])
+    return created, errors
@@ -0,0 +1,163 @@
+"""Ограничение числа одновременных запросов к действиям API на узле.
+
+Для действия с лимитом N в CONCURRENCY_LOCK_DIR заводится N файлов-слотов.
+Запрос выполняется, пока держит flock одного из них, поэтому лимит общий
+для всех процессов gunicorn на узле, а слот упавшего процесса освобождает
+ОС. Запрос, не получивший слот за queue_timeout секунд, получает 503
+с Retry-After. Счётчики пропущенных, ждавших и отклонённых запросов
+хранятся там же и общие для процессов.
+"""
+import fcntl
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+COUNTERS = ('admitted', 'queued', 'rejected')
+COUNTERS_FORMAT = f'<{len(COUNTERS)}q'
+COUNTERS_SIZE = struct.calcsize(COUNTERS_FORMAT)
+# Пауза между попытками занять слот растёт от первой до последней.
+POLL_DELAYS = (0.005, 0.05)
+
+
+class Overloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Сервер перегружен, повторите запрос позже.'
+    default_code = 'overloaded'
+
+    def __init__(self, wait):
+        super().__init__()
+        # Обработчик исключений DRF превращает wait в заголовок Retry-After.
+        self.wait = wait
+
+
+def try_lock(fd):
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+class Limiter:
+
+    def __init__(self, key, limit, queue_timeout=0, retry_after=1):
+        self.key = key
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.pid = None
+        self.prepare_lock = threading.Lock()
+
+    def path(self, name):
+        return os.path.join(
+            settings.CONCURRENCY_LOCK_DIR, f'{self.key}.{name}'
+        )
+
+    def open(self, name):
+        os.makedirs(settings.CONCURRENCY_LOCK_DIR, exist_ok=True)
+        return os.open(self.path(name), os.O_RDWR | os.O_CREAT, 0o600)
+
+    def prepare(self):
+        # Файлы открываются в каждом процессе: дескрипторы, унаследованные
+        # при fork, делили бы блокировки с родителем.
+        if self.pid == os.getpid():
+            return
+        with self.prepare_lock:
+            if self.pid == os.getpid():
+                return
+            self.slots = [self.open(index) for index in range(self.limit)]
+            # flock не разделяет потоки одного процесса.
+            self.slot_locks = [threading.Lock() for _ in range(self.limit)]
+            self.counters = self.open('stats')
+            self.counters_lock = threading.Lock()
+            self.pid = os.getpid()
+
+    def try_acquire(self):
+        for index, lock in enumerate(self.slot_locks):
+            if lock.acquire(blocking=False):
+                if try_lock(self.slots[index]):
+                    return index
+                lock.release()
+        return None
+
+    def acquire(self):
+        """Занимает слот и возвращает его номер или бросает Overloaded."""
+        self.prepare()
+        index = self.try_acquire()
+        if index is not None:
+            self.count('admitted')
+            return index
+        deadline = time.monotonic() + self.queue_timeout
+        delay, max_delay = POLL_DELAYS
+        while (remaining := deadline - time.monotonic()) > 0:
+            time.sleep(min(delay, remaining))
+            delay = min(2 * delay, max_delay)
+            index = self.try_acquire()
+            if index is not None:
+                self.count('admitted', 'queued')
+                return index
+        self.count('rejected')
+        raise Overloaded(self.retry_after)
+
+    def release(self, index):
+        fcntl.flock(self.slots[index], fcntl.LOCK_UN)
+        self.slot_locks[index].release()
+
+    def count(self, *names):
+        with self.counters_lock:
+            fcntl.flock(self.counters, fcntl.LOCK_EX)
+            try:
+                values = self.read_counters(self.counters)
+                for name in names:
+                    values[name] += 1
+                os.pwrite(
+                    self.counters,
+                    struct.pack(COUNTERS_FORMAT, *values.values()),
+                    0
+                )
+            finally:
+                fcntl.flock(self.counters, fcntl.LOCK_UN)
+
+    @staticmethod
+    def read_counters(fd):
+        data = os.pread(fd, COUNTERS_SIZE, 0).ljust(COUNTERS_SIZE, b'\0')
+        return dict(zip(COUNTERS, struct.unpack(COUNTERS_FORMAT, data)))
+
+    def stats(self, reset=False):
+        """Счётчики и число занятых сейчас слотов (со стороны)."""
+        fds = [self.open(index) for index in range(self.limit)]
+        counters = self.open('stats')
+        try:
+            busy = 0
+            for fd in fds:
+                if try_lock(fd):
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                else:
+                    busy += 1
+            fcntl.flock(counters, fcntl.LOCK_EX)
+            values = self.read_counters(counters)
+            if reset:
+                os.pwrite(counters, bytes(COUNTERS_SIZE), 0)
+            return {'limit': self.limit, 'busy': busy, **values}
+        finally:
+            for fd in (*fds, counters):
+                os.close(fd)
+
+
+limiters = {}
+
+
+def get_limiter(key):
+    """Ограничитель для ключа «basename.action» или None без лимита."""
+    options = settings.CONCURRENCY_LIMITS.get(key)
+    if options is None:
+        return None
+    limiter = limiters.get(key)
+    if limiter is None:
+        limiter = limiters.setdefault(key, Limiter(key, **options))
+    return limiter
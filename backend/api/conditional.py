@@ -0,0 +1,101 @@
+"""Условные GET-запросы (ETag, Last-Modified) к рецептам.
+
+Валидатор строится до сборки ответа: для рецепта — из updated_at и флагов
+пользователя одним запросом, для страницы списка — из max(updated_at)
+отфильтрованных рецептов, состава страницы и флагов пользователя.
+"""
+import hashlib
+
+from django.db.models import Exists, Max, OuterRef
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from api.representations import (FAVORITED, IN_SHOPPING_CART, SUBSCRIBED,
+                                 flag_kinds)
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscriptions
+
+
+def make_etag(*parts):
+    return 'W/"{}"'.format(
+        hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+    )
+
+
+def recipe_state_queryset(user, fields=None):
+    """Всё, от чего зависит ответ о рецепте, одним индексным запросом.
+
+    fields — поля ответа (None — все): флаги других полей не запрашиваются.
+    """
+    queryset = Recipe.objects.order_by()
+    if not user.is_authenticated:
+        return queryset.values('id', 'updated_at')
+    flags = {
+        FAVORITED: ('is_favorited', Exists(
+            Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+        )),
+        IN_SHOPPING_CART: ('is_in_shopping_cart', Exists(
+            ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+        )),
+        SUBSCRIBED: ('is_subscribed', Exists(
+            Subscriptions.objects.filter(
+                user=user, following=OuterRef('author')
+            )
+        )),
+    }
+    annotations = dict(flags[kind] for kind in flag_kinds(fields))
+    return queryset.annotate(**annotations).values(
+        'id', 'author_id', 'updated_at', *annotations
+    )
+
+
+def recipe_state_flags(state):
+    """Флаги пользователя в формате user_flags_queryset."""
+    flags = []
+    if state.get('is_favorited'):
+        flags.append((state['id'], FAVORITED))
+    if state.get('is_in_shopping_cart'):
+        flags.append((state['id'], IN_SHOPPING_CART))
+    if state.get('is_subscribed'):
+        flags.append((state['author_id'], SUBSCRIBED))
+    return flags
+
+
+def recipe_validators(state, fields=None):
+    return (
+        make_etag(*state.values(), fields),
+        int(state['updated_at'].timestamp())
+    )
+
+
+def list_etag(request, last_modified, count, ids, flags):
+    return make_etag(
+        request.get_full_path(), last_modified, count, ids, sorted(flags)
+    )
+
+
+def list_last_modified(queryset):
+    return queryset.aggregate(last=Max('updated_at'))['last']
+
+
+async def alist_last_modified(queryset):
+    return (await queryset.aaggregate(last=Max('updated_at')))['last']
+
+
+def not_modified(request, etag, last_modified=None):
+    """Ответ 304, если клиент прислал актуальный валидатор, иначе None."""
+    if request.user.is_authenticated:
+        # Флаги пользователя меняются, не трогая updated_at рецепта.
+        last_modified = None
+    return get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Флаги в ответе зависят от токена.
+    patch_vary_headers(response, ('Authorization',))
+    return response
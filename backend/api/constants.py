@@ -1,2 +1,11 @@
 PAGE_SIZE = 6
 PAGE_SIZE_QUERY_PARAM = 'limit'
+MAX_PANTRY_INGREDIENTS = 100
+# Страницы больше этого размера ограничиваются отдельно.
+LARGE_PAGE_SIZE = 100
+# Рецептов в одном запросе POST /api/recipes/bulk/ и в одной транзакции.
+MAX_BULK_RECIPES = 10000
+BULK_BATCH_SIZE = 500
+# Записей журнала на странице GET /api/recipes/changes/.
+CHANGES_PAGE_SIZE = 100
+MAX_CHANGES_PAGE_SIZE = 1000
@@ -0,0 +1,97 @@
+"""Число объектов для страниц ?page= без COUNT(*) на каждый запрос.
+
+Режим задаёт PAGINATION_COUNT: exact — COUNT(*) всегда, cached — COUNT(*)
+кэшируется на PAGINATION_COUNT_TTL секунд, estimated — вдобавок выборки
+больше PAGINATION_ESTIMATE_THRESHOLD считает планировщик PostgreSQL
+(pg_class.reltuples без фильтров, иначе EXPLAIN). Ключ кэша — SQL выборки
+без сортировки: одинаковые наборы фильтров в любом порядке параметров
+дают один ключ. Число из кэша или оценки помечается как неточное.
+"""
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+COUNT_CACHE_KEY = 'page-count:{}'
+
+
+def count_cache():
+    return caches[settings.PAGINATION_COUNT_CACHE]
+
+
+def count_key(queryset):
+    sql, params = queryset.order_by().query.sql_with_params()
+    return COUNT_CACHE_KEY.format(hashlib.md5(
+        repr((sql, params)).encode(), usedforsecurity=False
+    ).hexdigest())
+
+
+def estimate(queryset):
+    """Оценка числа строк планировщиком PostgreSQL или None."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    if not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        rows = row[0] if row else None
+    else:
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        rows = plan[0]['Plan']['Plan Rows']
+    # reltuples = -1: таблица ещё не анализировалась.
+    if rows is None or rows < 0:
+        return None
+    return int(rows)
+
+
+def usable_estimate(estimated):
+    if (
+        estimated is not None
+        and estimated >= settings.PAGINATION_ESTIMATE_THRESHOLD
+    ):
+        return estimated
+    return None
+
+
+def object_count(queryset):
+    """(число объектов, точное ли оно) по режиму PAGINATION_COUNT."""
+    if settings.PAGINATION_COUNT == 'exact':
+        return queryset.count(), True
+    cache = count_cache()
+    key = count_key(queryset)
+    count = cache.get(key)
+    if count is not None:
+        return count, False
+    count = None
+    if settings.PAGINATION_COUNT == 'estimated':
+        count = usable_estimate(estimate(queryset))
+    exact = count is None
+    if exact:
+        count = queryset.count()
+    cache.set(key, count, settings.PAGINATION_COUNT_TTL)
+    return count, exact
+
+
+async def aobject_count(queryset):
+    if settings.PAGINATION_COUNT == 'exact':
+        return await queryset.acount(), True
+    cache = count_cache()
+    key = count_key(queryset)
+    count = await cache.aget(key)
+    if count is not None:
+        return count, False
+    count = None
+    if settings.PAGINATION_COUNT == 'estimated':
+        count = usable_estimate(await sync_to_async(estimate)(queryset))
+    exact = count is None
+    if exact:
+        count = await queryset.acount()
+    await cache.aset(key, count, settings.PAGINATION_COUNT_TTL)
+    return count, exact
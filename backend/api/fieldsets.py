@@ -0,0 +1,79 @@
+"""Выбор полей ответа параметрами ?fields= и ?exclude=.
+
+?fields=id,name оставляет перечисленные поля, ?exclude=text убирает их.
+Поля выбираются до запросов к БД: представления не читают столбцы
+и связанные таблицы, которые не попадут в ответ.
+
+?include=normalized заменяет вложенные объекты списка ссылками
+(author -> author_id), а сами объекты возвращает один раз на страницу
+в словарях по id (authors).
+"""
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+EXCLUDE_PARAM = 'exclude'
+INCLUDE_PARAM = 'include'
+NORMALIZED = 'normalized'
+
+
+def split_fields(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def requested_fields(query_params, available):
+    """Поля ответа в порядке available или None, если нужны все."""
+    fields = query_params.get(FIELDS_PARAM)
+    exclude = query_params.get(EXCLUDE_PARAM)
+    if not fields and not exclude:
+        return None
+    selected = split_fields(fields) if fields else set(available)
+    excluded = split_fields(exclude) if exclude else set()
+    errors = {
+        param: 'Неизвестные поля: {}.'.format(', '.join(sorted(unknown)))
+        for param, names in ((FIELDS_PARAM, selected),
+                             (EXCLUDE_PARAM, excluded))
+        if (unknown := names - set(available))
+    }
+    if errors:
+        raise ValidationError(errors)
+    return tuple(
+        field for field in available
+        if field in selected and field not in excluded
+    )
+
+
+def normalized_requested(query_params):
+    include = query_params.get(INCLUDE_PARAM)
+    if not include:
+        return False
+    if include != NORMALIZED:
+        raise ValidationError(
+            {INCLUDE_PARAM: f'Поддерживается только {NORMALIZED}.'}
+        )
+    return True
+
+
+def normalize(items, nested):
+    """Заменяет вложенные объекты items ссылками на них.
+
+    nested — {поле: (поле-ссылка, имя словаря)}; поле содержит объект
+    или список объектов с id. Возвращает (items, {имя словаря: {id: объект}}).
+    """
+    included = {name: {} for _, name in nested.values()}
+    normalized = []
+    for item in items:
+        result = {}
+        for field, value in item.items():
+            if field not in nested:
+                result[field] = value
+                continue
+            reference, name = nested[field]
+            objects = value if isinstance(value, list) else [value]
+            for obj in objects:
+                included[name][obj['id']] = obj
+            result[reference] = (
+                [obj['id'] for obj in objects]
+                if isinstance(value, list) else value['id']
+            )
+        normalized.append(result)
+    return normalized, included
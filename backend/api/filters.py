@@ -1,6 +1,10 @@
+from django.db.models import F
 from django_filters import rest_framework
 
+from recipes.constants import MAX_TAG_MASK_BIT
 from recipes.models import Ingredient, Recipe, Tag
+from recipes.popularity import POPULARITY_ORDERING
+from recipes.utils import tags_mask
 
 
 class IngredientFilter(rest_framework.FilterSet):
@@ -17,6 +21,7 @@ class RecipeFilter(rest_framework.FilterSet):
         field_name='tags__slug',
         queryset=Tag.objects.all(),
         to_field_name='slug',
+        method='filter_tags',
     )
     is_favorited = rest_framework.BooleanFilter(
         method='filter_is_favorited'
@@ -25,6 +30,10 @@ class RecipeFilter(rest_framework.FilterSet):
     is_in_shopping_cart = rest_framework.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    ordering = rest_framework.ChoiceFilter(
+        choices=(('popular', 'popular'),),
+        method='filter_ordering',
+    )
 
     class Meta:
         model = Recipe
@@ -32,7 +41,8 @@ class RecipeFilter(rest_framework.FilterSet):
             'author',
             'tags',
             'is_favorited',
-            'is_in_shopping_cart'
+            'is_in_shopping_cart',
+            'ordering'
         )
 
     def helper_filter(self, queryset, value, field_filter):
@@ -41,8 +51,23 @@ class RecipeFilter(rest_framework.FilterSet):
             return queryset.filter(**{field_filter: user})
         return queryset
 
+    def filter_tags(self, queryset, name, tags):
+        if not tags:
+            return queryset
+        tag_ids = [tag.id for tag in tags]
+        if max(tag_ids) > MAX_TAG_MASK_BIT:
+            return queryset.filter(tags__in=tag_ids).distinct()
+        # Одно условие по Recipe.tags_mask вместо JOIN с RecipeTag и DISTINCT.
+        return queryset.alias(
+            tags_matched=F('tags_mask').bitand(tags_mask(tag_ids))
+        ).filter(tags_matched__gt=0)
+
     def filter_is_favorited(self, queryset, name, value):
         return self.helper_filter(queryset, value, 'favorites__user')
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         return self.helper_filter(queryset, value, 'shoppingcarts__user')
+
+    def filter_ordering(self, queryset, name, value):
+        # Recipe.popularity пересчитывает команда refresh_popularity.
+        return queryset.order_by(*POPULARITY_ORDERING)
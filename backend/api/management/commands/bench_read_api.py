@@ -0,0 +1,89 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+from urllib.error import URLError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import Recipe
+
+READ_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/?limit=50',
+    '/api/recipes/{recipe_id}/',
+    '/api/tags/',
+    '/api/ingredients/?name=а',
+)
+
+
+def percentile(values, percent):
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare throughput of read endpoints on running servers, '
+        'e.g. gunicorn (WSGI) and uvicorn (ASGI) over the same BD'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'targets',
+            nargs='+',
+            help='Base URLs, e.g. http://127.0.0.1:8000',
+        )
+        parser.add_argument('--concurrency', type=int, default=64)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--token', help='Authorization token')
+
+    def handle(self, *args, **options):
+        recipe_ids = list(
+            Recipe.objects.values_list('id', flat=True)[:100]
+        )
+        if not recipe_ids:
+            raise CommandError('Seed BD first (seed_recipes).')
+        paths = [
+            quote(path.format(
+                recipe_id=recipe_ids[number % len(recipe_ids)]
+            ), safe='/?=&')
+            for number, path in enumerate(
+                islice(cycle(READ_PATHS), options['requests'])
+            )
+        ]
+        headers = {'Accept': 'application/json'}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+
+        for target in options['targets']:
+            self.run_target(
+                target.rstrip('/'), paths, headers, options['concurrency']
+            )
+
+    def run_target(self, target, paths, headers, concurrency):
+        def fetch(path):
+            started = time.perf_counter()
+            try:
+                with urlopen(Request(target + path, headers=headers)) as resp:
+                    resp.read()
+                    ok = resp.status < 400
+            except URLError:
+                ok = False
+            return time.perf_counter() - started, ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(fetch, paths))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for latency, _ in results)
+        errors = sum(1 for _, ok in results if not ok)
+        self.stdout.write(
+            f'{target}: {len(results) / elapsed:.1f} req/s, '
+            f'p50 {statistics.median(latencies) * 1000:.1f} ms, '
+            f'p95 {percentile(latencies, 95) * 1000:.1f} ms, '
+            f'p99 {percentile(latencies, 99) * 1000:.1f} ms, '
+            f'errors {errors}/{len(results)}'
+        )
@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.representations import load_recipes
+from api.serializers import ReadRecipeSerializer
+from recipes.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Check that load_recipes renders the same JSON as '
+        'ReadRecipeSerializer and compare CPU time per page'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--pages', type=int, default=20)
+        parser.add_argument('--user', type=int, help='Viewer id')
+
+    def handle(self, *args, **options):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        if options['user']:
+            request.user = User.objects.get(id=options['user'])
+        else:
+            request.user = User.objects.filter(follows__isnull=False).first()
+        renderer = JSONRenderer()
+        serializer_time = fast_time = 0
+        pages = 0
+        for page in range(options['pages']):
+            start = page * options['page_size']
+            ids = list(Recipe.objects.values_list('id', flat=True)[
+                start:start + options['page_size']
+            ])
+            if not ids:
+                break
+            pages += 1
+
+            started = time.process_time()
+            expected = renderer.render(ReadRecipeSerializer(
+                Recipe.objects.filter(id__in=ids),
+                many=True,
+                context={'request': request}
+            ).data)
+            serializer_time += time.process_time() - started
+
+            started = time.process_time()
+            actual = renderer.render(load_recipes(ids, request))
+            fast_time += time.process_time() - started
+
+            if actual != expected:
+                raise CommandError(f'Page {page}: responses differ.')
+        if not pages:
+            raise CommandError('Seed BD first (seed_recipes).')
+        self.stdout.write(self.style.SUCCESS(
+            f'{pages} pages identical. CPU per page: '
+            f'serializer {serializer_time / pages * 1000:.1f} ms, '
+            f'load_recipes {fast_time / pages * 1000:.1f} ms'
+        ))
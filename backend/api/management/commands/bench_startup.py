@@ -0,0 +1,62 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Выполняется в новом процессе: время импорта и первых запросов.
+CHILD = '''
+import json, os, sys, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
+from foodgram_backend.wsgi import application
+result = {'load': time.perf_counter() - started, 'warm_up': 0}
+from foodgram_backend.warmup import WARM_UP_PATHS, warm_up, wsgi_get
+if sys.argv[1] == 'warm':
+    started = time.perf_counter()
+    warm_up(application)
+    result['warm_up'] = time.perf_counter() - started
+for name in ('first', 'second'):
+    started = time.perf_counter()
+    for path in WARM_UP_PATHS:
+        assert wsgi_get(application, path) == 200, path
+    result[name] = time.perf_counter() - started
+print(json.dumps(result))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure application import time and time to first requests '
+        'in fresh processes, with and without the gunicorn warm-up'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def run_child(self, mode):
+        child = subprocess.run(
+            (sys.executable, '-c', CHILD, mode),
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+        )
+        if child.returncode:
+            raise CommandError(child.stderr)
+        return json.loads(child.stdout.splitlines()[-1])
+
+    def handle(self, *args, **options):
+        columns = ('load', 'warm_up', 'first', 'second')
+        self.stdout.write(
+            'Medians, ms (first/second: requests to '
+            '/api/tags/, /api/ingredients/, /api/recipes/?limit=1)'
+        )
+        self.stdout.write('\t'.join(('mode', *columns)))
+        for mode in ('cold', 'warm'):
+            runs = [self.run_child(mode) for _ in range(options['repeat'])]
+            self.stdout.write('\t'.join((mode, *(
+                f'{statistics.median(run[column] for run in runs) * 1000:.1f}'
+                for column in columns
+            ))))
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.concurrency import get_limiter
+
+
+class Command(BaseCommand):
+    help = (
+        'Show concurrency limits of this node: busy slots and counts of '
+        'admitted, queued and rejected requests'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reset the counters after reading them',
+        )
+
+    def handle(self, *args, **options):
+        columns = ('limit', 'busy', 'admitted', 'queued', 'rejected')
+        self.stdout.write('\t'.join(('key', *columns)))
+        for key in sorted(settings.CONCURRENCY_LIMITS):
+            stats = get_limiter(key).stats(reset=options['reset'])
+            self.stdout.write('\t'.join(
+                (key, *(str(stats[column]) for column in columns))
+            ))
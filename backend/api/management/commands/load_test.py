@@ -0,0 +1,342 @@
+import json
+import re
+import statistics
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from pathlib import Path
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from api.management.commands.bench_read_api import percentile
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+COLLECTION = (
+    Path(settings.BASE_DIR).parent
+    / 'postman_collection' / 'foodgram.postman_collection.json'
+)
+# Виртуальные пользователи; их удаляет postman_collection/clear_db.sh.
+LOAD_TEST_USERNAME = 'loadtest-{}'
+LOAD_TEST_PASSWORD = 'LoadTest-Pa$$w0rd'
+# Сценарий по умолчанию: чтение, подписки, избранное и покупки, которые
+# в конце итерации отменяются, поэтому сценарий можно повторять.
+DEFAULT_FLOWS = (
+    'users/get_user_info/',
+    'tags/get_tags_info/',
+    'ingredients/get_ingradients/',
+    'recipes/get_recipes/',
+    'recipes/get_recipe_short_link/',
+    'subscriptions/create_subscriptions/',
+    'subscriptions/get_subscriptions/',
+    'shopping_cart/add_to_shopping_cart/',
+    'shopping_cart/download_shopping_cart/',
+    'favorite/add_to_favorite/',
+    'recipe_filters_for_favorite_and_shopping_cart/',
+    'delete_requests/subscriptions/delete_',
+    'delete_requests/shopping_cart/remove_from_shopping_cart',
+    'delete_requests/favorite/remove_from_favorite',
+)
+VARIABLE = re.compile(r'{{(\w+)}}')
+# Токен для запросов без auth — по окончанию названия.
+AUTH_BY_NAME = (
+    ('// Second User', 'Token {{secondUserToken}}'),
+    ('// User', 'Token {{userToken}}'),
+)
+RECIPE_VARIABLES = (
+    'firstRecipeId', 'secondRecipeId', 'thirdRecipeId', 'fourthRecipeId',
+    'fifthRecipeId',
+)
+
+
+def expected_statuses(item):
+    """Коды ответа из тестов запроса в коллекции (проверки статуса)."""
+    statuses = set()
+    for event in item.get('event', ()):
+        for line in event['script']['exec']:
+            if re.search('статус|status', line, re.IGNORECASE):
+                statuses.update(
+                    int(code) for code in re.findall(r'\b[1-5]\d\d\b', line)
+                    if int(code) in HTTPStatus._value2member_map_
+                )
+    return statuses
+
+
+def authorization(item):
+    request = item['request']
+    auth = request.get('auth')
+    if auth is None:
+        for suffix, value in AUTH_BY_NAME:
+            if item['name'].rstrip().endswith(suffix):
+                return value
+        return None
+    if auth['type'] != 'apikey':
+        return None
+    values = {entry['key']: entry['value'] for entry in auth['apikey']}
+    return values.get('value')
+
+
+def load_requests(path):
+    """Запросы коллекции по порядку, с путём «папка/.../название»."""
+    with open(path, encoding='utf-8') as file:
+        collection = json.load(file)
+    variables = {
+        variable['key']: variable['value']
+        for variable in collection.get('variable', ())
+    }
+    requests = []
+
+    def walk(items, prefix):
+        for item in items:
+            path = f'{prefix}{item["name"].strip()}'
+            if 'item' in item:
+                walk(item['item'], f'{path}/')
+                continue
+            request = item['request']
+            url = request['url']
+            headers = {
+                header['key']: header['value']
+                for header in request.get('header', ())
+                if not header.get('disabled')
+                and header['key'].lower() != 'authorization'
+            }
+            body = request.get('body', {}).get('raw')
+            if body:
+                headers.setdefault('Content-Type', 'application/json')
+            requests.append({
+                'path': path,
+                'method': request['method'],
+                'url': url['raw'] if isinstance(url, dict) else url,
+                'headers': headers,
+                'authorization': authorization(item),
+                'body': body,
+                'expected': expected_statuses(item),
+            })
+
+    walk(collection['item'], '')
+    return requests, variables
+
+
+def substitute(template, variables):
+    return VARIABLE.sub(
+        lambda match: str(variables.get(match[1], match[0])), template
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay flows of the Postman collection with many concurrent '
+        'users against a running server and report throughput, latency '
+        'percentiles and errors per request. Reset state between runs '
+        'with postman_collection/clear_db.sh'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target',
+            default='http://127.0.0.1:8000',
+            help='Base URL of the server',
+        )
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=30,
+            help='Seconds to run (ignored with --iterations)',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            help='Run the flow this many times per user',
+        )
+        parser.add_argument(
+            '--flow',
+            action='append',
+            help='Request path prefix from --list (repeatable); '
+                 'by default read, subscribe, favorite and cart flows',
+        )
+        parser.add_argument('--collection', default=str(COLLECTION))
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='Print request paths of the collection and exit',
+        )
+
+    def handle(self, *args, **options):
+        requests, collection_variables = load_requests(options['collection'])
+        if options['list']:
+            for request in requests:
+                expected = ','.join(map(str, sorted(request['expected'])))
+                self.stdout.write(
+                    f'{request["method"]:6} {expected:7} {request["path"]}'
+                )
+            return
+        prefixes = tuple(options['flow'] or DEFAULT_FLOWS)
+        flow = [
+            request for request in requests
+            if request['path'].startswith(prefixes)
+        ]
+        if not flow:
+            raise CommandError('No requests match --flow.')
+        collection_variables['baseUrl'] = options['target'].rstrip('/')
+        users = [
+            {**collection_variables, **variables}
+            for variables in self.user_variables(options['concurrency'])
+        ]
+        self.stdout.write(
+            f'{len(flow)} requests per iteration, {len(users)} users.'
+        )
+
+        results = defaultdict(list)
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['duration']
+
+        def finished(iteration):
+            if options['iterations']:
+                return iteration >= options['iterations']
+            return time.monotonic() >= deadline
+
+        def run_user(variables):
+            iteration = 0
+            while not finished(iteration):
+                for request in flow:
+                    result = self.send(request, variables)
+                    with lock:
+                        results[request['path']].append(result)
+                iteration += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(users)) as executor:
+            for future in [executor.submit(run_user, user) for user in users]:
+                future.result()
+        self.report(flow, results, time.perf_counter() - started)
+
+    def user_variables(self, count):
+        """Переменные коллекции для count виртуальных пользователей.
+
+        «Второй» и «третий» пользователи — авторы рецептов из БД
+        (seed_recipes), рецепты — рецепты «второго».
+        """
+        tags = list(Tag.objects.order_by('id')[:3])
+        ingredients = list(Ingredient.objects.order_by('id')[:2])
+        author_ids = list(
+            Recipe.objects.order_by('author_id').values_list(
+                'author_id', flat=True
+            ).distinct()[:count + 1]
+        )
+        if len(tags) < 3 or len(ingredients) < 2 or len(author_ids) < 2:
+            raise CommandError(
+                'Seed the database first: load_tag, load_ingredient, '
+                'seed_recipes.'
+            )
+        password = make_password(LOAD_TEST_PASSWORD)
+        usernames = [LOAD_TEST_USERNAME.format(number)
+                     for number in range(count)]
+        User.objects.bulk_create(
+            [
+                User(
+                    username=username,
+                    email=f'{username}@foodgram.local',
+                    first_name='Load',
+                    last_name='Test',
+                    password=password,
+                )
+                for username in usernames
+            ],
+            ignore_conflicts=True,
+        )
+        users = User.objects.filter(username__in=usernames).order_by('id')
+        tokens = {
+            user_id: Token.objects.get_or_create(user_id=user_id)[0].key
+            for user_id in {*author_ids, *(user.id for user in users)}
+        }
+        common = {
+            'ingredientNameFirstLatter': quote(ingredients[0].name[:1]),
+            'firstIndredientId': ingredients[0].id,
+            'secondIndredientId': ingredients[1].id,
+        }
+        for name, tag in zip(('first', 'second', 'third'), tags):
+            common[f'{name}TagId'] = tag.id
+            common[f'{name}TagSlug'] = tag.slug
+        for number, user in enumerate(users):
+            second = author_ids[number % len(author_ids)]
+            third = author_ids[(number + 1) % len(author_ids)]
+            recipe_ids = list(Recipe.objects.filter(
+                author_id=second
+            ).order_by('id').values_list('id', flat=True)[:5])
+            yield {
+                **common,
+                'userId': user.id,
+                'userToken': tokens[user.id],
+                'secondUserId': second,
+                'secondUserToken': tokens[second],
+                'thirdUserId': third,
+                **{
+                    name: recipe_ids[index % len(recipe_ids)]
+                    for index, name in enumerate(RECIPE_VARIABLES)
+                },
+            }
+
+    def send(self, request, variables):
+        """Выполняет запрос: (длительность, ожидаемый ли ответ)."""
+        headers = {
+            key: substitute(value, variables)
+            for key, value in request['headers'].items()
+        }
+        if request['authorization']:
+            headers['Authorization'] = substitute(
+                request['authorization'], variables
+            )
+        body = request['body']
+        body = substitute(body, variables).encode() if body else None
+        url = quote(substitute(request['url'], variables), safe=':/?=&%')
+        started = time.perf_counter()
+        try:
+            with urlopen(Request(
+                url, data=body, headers=headers, method=request['method']
+            )) as response:
+                response.read()
+                status = response.status
+        except HTTPError as error:
+            error.read()
+            status = error.code
+        except URLError:
+            status = None
+        elapsed = time.perf_counter() - started
+        if request['expected']:
+            ok = status in request['expected']
+        else:
+            ok = status is not None and status < 400
+        return elapsed, ok
+
+    def report(self, flow, results, elapsed):
+        total = sum(len(values) for values in results.values())
+        errors = sum(
+            not ok for values in results.values() for _, ok in values
+        )
+        for request in flow:
+            values = results[request['path']]
+            if not values:
+                continue
+            latencies = sorted(latency for latency, _ in values)
+            failed = sum(not ok for _, ok in values)
+            self.stdout.write(
+                f'{request["method"]:6} {request["path"]}: '
+                f'{len(values) / elapsed:.1f} req/s, '
+                f'p50 {statistics.median(latencies) * 1000:.1f} ms, '
+                f'p95 {percentile(latencies, 95) * 1000:.1f} ms, '
+                f'p99 {percentile(latencies, 99) * 1000:.1f} ms, '
+                f'errors {failed / len(values):.1%}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Total: {total} requests in {elapsed:.1f}s, '
+            f'{total / elapsed:.1f} req/s, errors {errors}/{total}.'
+        ))
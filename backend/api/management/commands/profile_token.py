@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.profiling import make_token
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Print a signed token that enables profiling of requests: send it '
+        'in the X-Profile-Token header together with the same user\'s '
+        'API token'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email of an active staff user')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(
+            email=options['email'], is_staff=True, is_active=True
+        ).first()
+        if user is None:
+            raise CommandError('No active staff user with this email.')
+        if not settings.PROFILING:
+            self.stderr.write('PROFILING=False: the token has no effect.')
+        token = make_token(user)
+        self.stdout.write(token)
+        self.stderr.write(
+            f'Valid for {settings.PROFILING_TOKEN_MAX_AGE} s. '
+            f'Example: curl -H "X-Profile-Token: {token}" '
+            f'-H "Authorization: Token <API token of {user.email}>" ...'
+        )
@@ -0,0 +1,82 @@
+import io
+import json
+import pstats
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.profiling import profiles_dir
+
+
+class Command(BaseCommand):
+    help = (
+        'List saved request profiles or summarize one: slowest functions '
+        'from the .pstats file and SQL grouped by statement'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('id', nargs='?', help='Profile id to summarize')
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument(
+            '--sort',
+            default='cumulative',
+            choices=('cumulative', 'tottime', 'ncalls'),
+        )
+
+    def handle(self, *args, **options):
+        if options['id'] is None:
+            self.list_profiles(options['limit'])
+        else:
+            self.summarize(options['id'], options['limit'], options['sort'])
+
+    def read_report(self, path):
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+
+    def describe(self, report):
+        query = f'?{report["query"]}' if report['query'] else ''
+        return (
+            f'{report["method"]} {report["path"]}{query} '
+            f'{report["status"]}: {report["duration_ms"]:.0f} ms, '
+            f'SQL {report["sql_count"]} in {report["sql_ms"]:.0f} ms'
+        )
+
+    def list_profiles(self, limit):
+        paths = sorted(profiles_dir().glob('*.json'), reverse=True)
+        if not paths:
+            self.stdout.write(f'No profiles in {profiles_dir()}.')
+            return
+        for path in paths[:limit]:
+            report = self.read_report(path)
+            self.stdout.write(f'{report["id"]}  {self.describe(report)}')
+
+    def summarize(self, profile_id, limit, sort):
+        path = profiles_dir() / f'{profile_id}.json'
+        if not path.exists():
+            raise CommandError(f'No profile {profile_id}.')
+        report = self.read_report(path)
+        self.stdout.write(self.describe(report))
+
+        buffer = io.StringIO()
+        pstats.Stats(
+            str(profiles_dir() / f'{profile_id}.pstats'), stream=buffer
+        ).strip_dirs().sort_stats(sort).print_stats(limit)
+        self.stdout.write(buffer.getvalue())
+
+        statements = defaultdict(lambda: {'count': 0, 'ms': 0, 'max': 0})
+        for query in report['sql']:
+            statement = statements[query['sql']]
+            statement['count'] += 1
+            statement['ms'] += query['duration_ms']
+            statement['max'] = max(statement['max'], query['duration_ms'])
+            statement.setdefault('origin', query['origin'])
+        self.stdout.write('SQL by total time:')
+        for sql, statement in sorted(
+            statements.items(), key=lambda item: -item[1]['ms']
+        )[:limit]:
+            self.stdout.write(
+                f'{statement["ms"]:8.1f} ms  x{statement["count"]:<4} '
+                f'max {statement["max"]:.1f} ms  {sql[:200]}'
+            )
+            for frame in reversed(statement['origin']):
+                self.stdout.write(f'{"":12}{frame}')
@@ -0,0 +1,110 @@
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from api.concurrency import get_limiter
+from api.fieldsets import normalize, normalized_requested, requested_fields
+from foodgram_backend.db_router import (can_read_from_replica,
+                                        replica_reads, stick_to_primary)
+
+
+class ReplicaReadMixin:
+    """Читает безопасные запросы с реплик, а после записи — с primary."""
+
+    replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            request.method in SAFE_METHODS
+            and can_read_from_replica(request.user)
+        ):
+            self.replica_token = replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self.replica_token is not None:
+            replica_reads.reset(self.replica_token)
+            self.replica_token = None
+        elif (
+            request.method not in SAFE_METHODS
+            and request.user.is_authenticated
+            and response.status_code < 400
+        ):
+            stick_to_primary(request.user.id)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ConcurrencyLimitMixin:
+    """Ограничивает число одновременных запросов к действию на узле.
+
+    Лимиты задаёт CONCURRENCY_LIMITS по ключу concurrency_key().
+    """
+
+    concurrency_slot = None
+
+    def concurrency_key(self, request):
+        return f'{self.basename}.{self.action}'
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # После аутентификации и проверки прав: отказ не занимает слот.
+        limiter = get_limiter(self.concurrency_key(request))
+        if limiter is not None:
+            self.concurrency_slot = (limiter, limiter.acquire())
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # В т.ч. при исключении, которое DRF не обработал.
+            if self.concurrency_slot is not None:
+                limiter, index = self.concurrency_slot
+                limiter.release(index)
+                self.concurrency_slot = None
+
+
+class ResponseFieldsMixin:
+    """Поля ответа на безопасные запросы по ?fields= и ?exclude=.
+
+    Сериализатор получает их в контексте ('fields'), представления
+    используют их, чтобы не читать ненужные столбцы и связи. Списки,
+    отданные через list_response, поддерживают ?include=normalized.
+    """
+
+    # {поле: (поле-ссылка, имя словаря)} для ?include=normalized.
+    normalized_fields = {}
+
+    def available_fields(self):
+        return self.get_serializer_class().Meta.fields
+
+    def response_fields(self):
+        """Выбранные поля или None, если нужны все."""
+        if self.request.method not in SAFE_METHODS:
+            return None
+        return requested_fields(
+            self.request.query_params, self.available_fields()
+        )
+
+    def get_serializer_context(self):
+        return {
+            **super().get_serializer_context(),
+            'fields': self.response_fields(),
+        }
+
+    def normalized(self):
+        return (
+            self.request.method in SAFE_METHODS
+            and normalized_requested(self.request.query_params)
+        )
+
+    def list_response(self, items, paginator=None):
+        """Ответ со списком; при ?include=normalized — со словарями."""
+        included = {}
+        if self.normalized():
+            items, included = normalize(items, self.normalized_fields)
+        if paginator is not None:
+            response = paginator.get_paginated_response(items)
+            response.data.update(included)
+            return response
+        if included:
+            return Response({'results': items, **included})
+        return Response(items)
@@ -1,8 +1,243 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, InvalidPage, Page, Paginator
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (BasePagination, PageNumberPagination,
+                                       _positive_int)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 from api.constants import PAGE_SIZE, PAGE_SIZE_QUERY_PARAM
+from api.counts import aobject_count, object_count
+from recipes.utils import PreciseJSONEncoder, keyset_filter
+
+COUNT_EXACT_HEADER = 'X-Count-Exact'
+
+
+class OpenPage(Page):
+    """Страница при неточном числе объектов.
+
+    Следующая страница есть, если за этой прочитан ещё один объект.
+    """
+
+    def __init__(self, rows, number, paginator):
+        super().__init__(rows[:paginator.per_page], number, paginator)
+        self.more = len(rows) > paginator.per_page
+
+    def has_next(self):
+        return self.more
+
+
+class CountPaginator(Paginator):
+    """Paginator с признаком точности числа объектов count_exact.
+
+    При approximate = True число queryset берётся из api.counts.
+    """
+
+    approximate = False
+    count_exact = True
+
+    @cached_property
+    def count(self):
+        if self.approximate and isinstance(self.object_list, QuerySet):
+            count, self.count_exact = object_count(self.object_list)
+            return count
+        return super().count
+
+    async def acount(self):
+        if self.approximate:
+            self.count, self.count_exact = await aobject_count(
+                self.object_list
+            )
+        else:
+            self.count = await self.object_list.acount()
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            # Неточное число может быть меньше настоящего: пустоту
+            # страницы проверяет open_page.
+            if self.count_exact or int(number) < 1:
+                raise
+            return int(number)
+
+    def page_rows(self, number):
+        bottom = (number - 1) * self.per_page
+        return self.object_list[bottom:bottom + self.per_page + 1]
+
+    def open_page(self, number, rows):
+        if not rows and number > 1:
+            raise EmptyPage(_('That page contains no results'))
+        return OpenPage(rows, number, self)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if self.count_exact:
+            return super().page(number)
+        return self.open_page(number, list(self.page_rows(number)))
+
+    async def apage(self, number):
+        """page() для async ORM; count задаёт acount()."""
+        number = self.validate_number(number)
+        if self.count_exact:
+            page = super().page(number)
+            page.object_list = [row async for row in page.object_list]
+            return page
+        return self.open_page(
+            number, [row async for row in self.page_rows(number)]
+        )
+
+
+class ApproximateCountPaginator(CountPaginator):
+    approximate = True
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     page_size = PAGE_SIZE
     page_size_query_param = PAGE_SIZE_QUERY_PARAM
+    django_paginator_class = CountPaginator
+
+    async def apaginate_queryset(self, queryset, request):
+        """Асинхронный вариант paginate_queryset для async ORM."""
+        paginator = self.django_paginator_class(
+            queryset, self.get_page_size(request)
+        )
+        await paginator.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = await paginator.apage(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        self.request = request
+        return list(self.page)
+
+    def count_headers(self):
+        """Заголовок о точности count: тело ответа не меняется."""
+        return {
+            COUNT_EXACT_HEADER: str(self.page.paginator.count_exact).lower()
+        }
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        for header, value in self.count_headers().items():
+            response[header] = value
+        return response
+
+
+class RecipePagination(LimitPageNumberPagination):
+    """Страницы рецептов: число из кэша или оценки (PAGINATION_COUNT)."""
+
+    django_paginator_class = ApproximateCountPaginator
+
+
+class KeysetPagination(BasePagination):
+    """Пагинация по ключу сортировки (без OFFSET) со ссылкой next."""
+
+    page_size = PAGE_SIZE
+    page_size_query_param = PAGE_SIZE_QUERY_PARAM
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        return base64.urlsafe_b64encode(
+            json.dumps(position, cls=PreciseJSONEncoder).encode()
+        ).decode()
+
+    def paginate(self, request, fetch, parse_position=None):
+        """fetch(position, limit) возвращает пары (ключ, объект) по порядку.
+
+        parse_position проверяет ключ из курсора (ValueError/TypeError —
+        курсор недействителен) и приводит его к типам fetch.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        if position is not None and parse_position is not None:
+            try:
+                position = parse_position(position)
+            except (TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        return self.take_page(fetch(position, page_size + 1), page_size)
+
+    def take_page(self, rows, page_size):
+        self.next_position = (
+            rows[page_size - 1][0] if len(rows) > page_size else None
+        )
+        return [item for _, item in rows[:page_size]]
+
+    def keyset_queryset(self, queryset, position):
+        """Ключи сортировки queryset (последний — id) после position."""
+        ordering = tuple(
+            queryset.query.order_by or queryset.model._meta.ordering
+        )
+        if ordering[-1].lstrip('-') != 'id':
+            ordering += ('-id',)
+        queryset = queryset.order_by(*ordering).values_list(
+            *(field.lstrip('-') for field in ordering)
+        )
+        if position is None:
+            return queryset
+        if not isinstance(position, list) or len(position) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            return queryset.filter(keyset_filter(ordering, position))
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Страница id объектов queryset в порядке его сортировки."""
+        return self.paginate(request, lambda position, limit: [
+            (row, row[-1])
+            for row in self.keyset_queryset(queryset, position)[:limit]
+        ])
+
+    async def apaginate_queryset(self, queryset, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = self.keyset_queryset(queryset, self.decode_cursor(request))
+        return self.take_page(
+            [(row, row[-1]) async for row in queryset[:page_size + 1]],
+            page_size
+        )
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position)
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
@@ -0,0 +1,26 @@
+import codecs
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """Список объектов JSON, по одному на строку."""
+
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get(
+            'encoding', settings.DEFAULT_CHARSET
+        )
+        items = []
+        for number, line in enumerate(codecs.getreader(encoding)(stream), 1):
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as error:
+                raise ParseError(f'Строка {number}: {error}')
+        return items
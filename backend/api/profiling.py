@@ -0,0 +1,184 @@
+"""Профилирование отдельных запросов по запросу сотрудника.
+
+Запрос с подписанным токеном (manage.py profile_token) в заголовке
+X-Profile-Token выполняется под cProfile, а SQL записывается
+с длительностью и местом вызова в коде проекта. Токен действует только
+вместе с токеном API того же сотрудника (Authorization) и недолго
+(PROFILING_TOKEN_MAX_AGE). В PROFILING_DIR сохраняются <id>.pstats
+и <id>.json, не больше PROFILING_MAX_PROFILES последних; id возвращается
+в заголовке X-Profile-Id, смотреть их — manage.py profiles.
+
+Запрос без токена только проверяет его отсутствие. Профилируются
+синхронные запросы (WSGI); асинхронные проходят без профилирования.
+"""
+import cProfile
+import json
+import logging
+import threading
+import time
+import traceback
+import uuid
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.authentication import CachedTokenAuthentication
+
+logger = logging.getLogger(__name__)
+
+TOKEN_HEADER = 'HTTP_X_PROFILE_TOKEN'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+TOKEN_SALT = 'api.profiling'
+# Мест вызова SQL в коде проекта на запрос.
+ORIGIN_FRAMES = 5
+# cProfile не допускает двух профилировщиков одновременно.
+profile_lock = threading.Lock()
+
+
+def make_token(user):
+    return signing.dumps(user.pk, salt=TOKEN_SALT)
+
+
+def token_user(request, token):
+    """Сотрудник, вошедший по токену API, если token подписан для него."""
+    try:
+        user_id = signing.loads(
+            token,
+            salt=TOKEN_SALT,
+            max_age=settings.PROFILING_TOKEN_MAX_AGE
+        )
+        # Аутентификация DRF читает только заголовок Authorization.
+        credentials = CachedTokenAuthentication().authenticate(request)
+    except (signing.BadSignature, AuthenticationFailed):
+        return None
+    if credentials is None:
+        return None
+    user = credentials[0]
+    if user.pk != user_id or not user.is_staff:
+        return None
+    return user
+
+
+def sql_origin():
+    """Последние кадры стека в коде проекта, кроме этого модуля."""
+    project = str(settings.BASE_DIR)
+    frames = [
+        f'{Path(frame.filename).relative_to(project)}:{frame.lineno} '
+        f'in {frame.name}'
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(project)
+        and frame.filename != __file__
+        and 'site-packages' not in frame.filename
+    ]
+    return frames[-ORIGIN_FRAMES:]
+
+
+class QueryRecorder:
+    """execute_wrapper: SQL без параметров, длительность и место вызова."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'many': many,
+                'duration_ms': (time.perf_counter() - started) * 1000,
+                'origin': sql_origin(),
+            })
+
+
+def profiles_dir():
+    return Path(settings.PROFILING_DIR)
+
+
+def prune_profiles():
+    """Оставляет PROFILING_MAX_PROFILES последних профилей."""
+    # id начинается со времени, поэтому порядок имён — порядок записи.
+    reports = sorted(profiles_dir().glob('*.json'), reverse=True)
+    for report in reports[settings.PROFILING_MAX_PROFILES:]:
+        report.with_suffix('.pstats').unlink(missing_ok=True)
+        report.unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    """Профилирует запросы с действительным токеном сотрудника."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.get_response(request)
+        token = request.META.get(TOKEN_HEADER)
+        if not token:
+            return self.get_response(request)
+        user = token_user(request, token)
+        if user is None or not profile_lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self.profile(request, user)
+        finally:
+            profile_lock.release()
+
+    def profile(self, request, user):
+        recorder = QueryRecorder()
+        profiler = cProfile.Profile()
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration = time.perf_counter() - started
+        profile_id = '{:%Y%m%d-%H%M%S-%f}-{}'.format(
+            started_at, uuid.uuid4().hex[:8]
+        )
+        directory = profiles_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(directory / f'{profile_id}.pstats')
+        report = {
+            'id': profile_id,
+            'started': started_at.isoformat(),
+            'staff_user': user.pk,
+            'method': request.method,
+            'path': request.path,
+            'query': request.GET.urlencode(),
+            'status': response.status_code,
+            'duration_ms': duration * 1000,
+            'sql_count': len(recorder.queries),
+            'sql_ms': sum(q['duration_ms'] for q in recorder.queries),
+            'sql': recorder.queries,
+        }
+        with open(directory / f'{profile_id}.json', 'w',
+                  encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=1)
+        prune_profiles()
+        logger.info('Профиль %s: %s %s', profile_id, request.method,
+                    request.path)
+        response[PROFILE_ID_HEADER] = profile_id
+        return response
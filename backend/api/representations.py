@@ -0,0 +1,348 @@
+"""Представления рецептов, собранные из строк .values() без сериализаторов.
+
+Формат ответа совпадает с ReadRecipeSerializer, TagSerializer
+и IngredientSerializer.
+
+Не зависящая от пользователя часть рецепта (фрагмент) хранится в кэше
+по id рецепта и поколению содержимого. Ответ собирается из фрагментов
+и одного запроса за флагами текущего пользователя.
+
+Если выбраны не все поля ответа (api.fieldsets), недостающие фрагменты
+читаются без лишних столбцов и таблиц и не кэшируются, флаги
+запрашиваются только для выбранных полей.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import CharField, Value
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            RecipeTag, ShoppingCart, Tag)
+from users.models import Subscriptions, User
+
+FAVORITED = 'favorited'
+IN_SHOPPING_CART = 'in_shopping_cart'
+SUBSCRIBED = 'subscribed'
+
+FRAGMENT_CACHE_KEY = 'recipe-fragment:{}:{}'
+GENERATION_CACHE_KEY = 'recipe-fragment-generation'
+
+USER_FIELDS = ('email', 'id', 'username', 'first_name', 'last_name')
+RECIPE_FIELDS = ('id', 'name', 'image', 'text', 'cooking_time')
+AUTHOR_VALUES = tuple(
+    f'author__{field}' for field in USER_FIELDS + ('avatar',)
+)
+# Поля ответа в порядке ReadRecipeSerializer.
+RECIPE_RESPONSE_FIELDS = (
+    'id',
+    'tags',
+    'author',
+    'ingredients',
+    'is_favorited',
+    'is_in_shopping_cart',
+    'name',
+    'image',
+    'text',
+    'cooking_time',
+)
+# Вложенные объекты рецепта для ?include=normalized.
+NORMALIZED_RECIPE_FIELDS = {
+    'author': ('author_id', 'authors'),
+    'tags': ('tag_ids', 'tags'),
+}
+# Поле ответа и флаг пользователя, от которого оно зависит.
+FLAG_FIELDS = (
+    ('is_favorited', FAVORITED),
+    ('is_in_shopping_cart', IN_SHOPPING_CART),
+    ('author', SUBSCRIBED),
+)
+TAG_VALUES = ('id', 'name', 'slug')
+INGREDIENT_VALUES = ('id', 'name', 'measurement_unit')
+
+
+def fragment_cache():
+    """Кэш фрагментов или None, если он отключён."""
+    if not settings.RECIPE_FRAGMENT_CACHE:
+        return None
+    return caches[settings.RECIPE_FRAGMENT_CACHE]
+
+
+def media_url(request, field, name):
+    """Повторяет ImageField.to_representation из DRF."""
+    if not name:
+        return None
+    return request.build_absolute_uri(field.storage.url(name))
+
+
+def tag_queryset():
+    return Tag.objects.values(*TAG_VALUES)
+
+
+def ingredient_queryset():
+    return Ingredient.objects.values(*INGREDIENT_VALUES)
+
+
+def fragment_querysets(ids, fields=None):
+    """Запросы за не зависящей от пользователя частью рецептов.
+
+    fields — поля ответа (None — все): остальные столбцы не читаются,
+    а теги и ингредиенты не запрашиваются, если их нет среди полей.
+    """
+    fields = fields or RECIPE_RESPONSE_FIELDS
+    values = ['id', *(
+        field for field in RECIPE_FIELDS if field != 'id' and field in fields
+    )]
+    if 'author' in fields:
+        values.extend(AUTHOR_VALUES)
+    querysets = {
+        'recipes': Recipe.objects.filter(id__in=ids).order_by().values(
+            *values
+        ),
+    }
+    if 'tags' in fields:
+        querysets['tags'] = RecipeTag.objects.filter(
+            recipe_id__in=ids
+        ).values(
+            'recipe_id', 'tag_id', 'tag__name', 'tag__slug'
+        ).order_by('tag__name')
+    if 'ingredients' in fields:
+        querysets['ingredients'] = RecipeIngredient.objects.filter(
+            recipe_id__in=ids
+        ).values(
+            'recipe_id',
+            'ingredient_id',
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            'amount'
+        ).order_by('ingredient__name')
+    return querysets
+
+
+def flag_kinds(fields=None):
+    """Флаги пользователя, от которых зависят поля ответа."""
+    return [
+        kind for field, kind in FLAG_FIELDS
+        if fields is None or field in fields
+    ]
+
+
+def user_flags_queryset(user, recipe_ids, kinds):
+    """Один запрос за избранным, корзиной и подписками пользователя."""
+    def flagged(queryset, field, kind):
+        return queryset.order_by().annotate(
+            kind=Value(kind, output_field=CharField())
+        ).values_list(field, 'kind')
+
+    querysets = {
+        FAVORITED: lambda: flagged(
+            Favorite.objects.filter(user=user, recipe_id__in=recipe_ids),
+            'recipe_id',
+            FAVORITED
+        ),
+        IN_SHOPPING_CART: lambda: flagged(
+            ShoppingCart.objects.filter(user=user, recipe_id__in=recipe_ids),
+            'recipe_id',
+            IN_SHOPPING_CART
+        ),
+        SUBSCRIBED: lambda: flagged(
+            Subscriptions.objects.filter(
+                user=user, following__recipes__id__in=recipe_ids
+            ),
+            'following_id',
+            SUBSCRIBED
+        ),
+    }
+    first, *rest = [querysets[kind]() for kind in kinds]
+    return first.union(*rest) if rest else first
+
+
+def user_flags(user, recipe_ids, fields=None):
+    kinds = flag_kinds(fields)
+    if not user.is_authenticated or not kinds:
+        return []
+    return list(user_flags_queryset(user, recipe_ids, kinds))
+
+
+async def auser_flags(user, recipe_ids, fields=None):
+    kinds = flag_kinds(fields)
+    if not user.is_authenticated or not kinds:
+        return []
+    return [
+        row async for row in user_flags_queryset(user, recipe_ids, kinds)
+    ]
+
+
+def fragment_keys(ids, generation):
+    return {
+        FRAGMENT_CACHE_KEY.format(generation, recipe_id): recipe_id
+        for recipe_id in ids
+    }
+
+
+def build_fragments(rows):
+    """Фрагменты рецептов из результатов fragment_querysets.
+
+    Изображения хранятся именами файлов: абсолютный URL зависит от запроса.
+    """
+    fragments = {}
+    for row in rows['recipes']:
+        fragment = {
+            field: row[field] for field in RECIPE_FIELDS if field in row
+        }
+        if 'author__id' in row:
+            fragment['author'] = {
+                field: row[f'author__{field}']
+                for field in USER_FIELDS + ('avatar',)
+            }
+        for name in ('tags', 'ingredients'):
+            if name in rows:
+                fragment[name] = []
+        fragments[row['id']] = fragment
+    for row in rows.get('tags', ()):
+        fragments[row['recipe_id']]['tags'].append({
+            'id': row['tag_id'],
+            'name': row['tag__name'],
+            'slug': row['tag__slug'],
+        })
+    for row in rows.get('ingredients', ()):
+        fragments[row['recipe_id']]['ingredients'].append({
+            'id': row['ingredient_id'],
+            'name': row['ingredient__name'],
+            'measurement_unit': row['ingredient__measurement_unit'],
+            'amount': row['amount'],
+        })
+    return fragments
+
+
+def load_recipes(ids, request, flags=None, fields=None):
+    cache = fragment_cache()
+    fragments = {}
+    if cache is not None:
+        generation = cache.get_or_set(GENERATION_CACHE_KEY, 0, None)
+        keys = fragment_keys(ids, generation)
+        fragments = {
+            keys[key]: fragment
+            for key, fragment in cache.get_many(list(keys)).items()
+        }
+    missing = [recipe_id for recipe_id in ids if recipe_id not in fragments]
+    if missing:
+        built = build_fragments({
+            name: list(queryset)
+            for name, queryset in fragment_querysets(missing, fields).items()
+        })
+        if fields is None and cache is not None:
+            cache.set_many(
+                {
+                    FRAGMENT_CACHE_KEY.format(generation, recipe_id): fragment
+                    for recipe_id, fragment in built.items()
+                },
+                settings.RECIPE_FRAGMENT_TTL
+            )
+        fragments.update(built)
+    if flags is None:
+        flags = user_flags(request.user, ids, fields)
+    return build_recipes(ids, request, fragments, flags, fields)
+
+
+async def aload_recipes(ids, request, flags=None, fields=None):
+    cache = fragment_cache()
+    fragments = {}
+    if cache is not None:
+        generation = await cache.aget_or_set(GENERATION_CACHE_KEY, 0, None)
+        keys = fragment_keys(ids, generation)
+        fragments = {
+            keys[key]: fragment
+            for key, fragment in (await cache.aget_many(list(keys))).items()
+        }
+    missing = [recipe_id for recipe_id in ids if recipe_id not in fragments]
+    if missing:
+        rows = {}
+        for name, queryset in fragment_querysets(missing, fields).items():
+            rows[name] = [row async for row in queryset]
+        built = build_fragments(rows)
+        if fields is None and cache is not None:
+            await cache.aset_many(
+                {
+                    FRAGMENT_CACHE_KEY.format(generation, recipe_id): fragment
+                    for recipe_id, fragment in built.items()
+                },
+                settings.RECIPE_FRAGMENT_TTL
+            )
+        fragments.update(built)
+    if flags is None:
+        flags = await auser_flags(request.user, ids, fields)
+    return build_recipes(ids, request, fragments, flags, fields)
+
+
+def invalidate_fragments(recipe_ids=None):
+    """Сбрасывает фрагменты рецептов, а без recipe_ids — все фрагменты.
+
+    Полный сброс — это смена поколения: старые ключи истекают сами.
+    """
+    cache = fragment_cache()
+    if cache is None:
+        return
+    if recipe_ids is None:
+        try:
+            cache.incr(GENERATION_CACHE_KEY)
+        except ValueError:
+            cache.set(GENERATION_CACHE_KEY, 1, None)
+        return
+    generation = cache.get_or_set(GENERATION_CACHE_KEY, 0, None)
+    cache.delete_many(list(fragment_keys(recipe_ids, generation)))
+
+
+def user_representation(row, request, is_subscribed):
+    data = {field: row[field] for field in USER_FIELDS}
+    data['is_subscribed'] = is_subscribed
+    data['avatar'] = media_url(
+        request, User._meta.get_field('avatar'), row['avatar']
+    )
+    return data
+
+
+def build_recipes(ids, request, fragments, flag_rows, fields=None):
+    """Собирает рецепты в порядке ids из фрагментов и флагов пользователя.
+
+    fields — поля ответа (None — все).
+    """
+    flags = {FAVORITED: set(), IN_SHOPPING_CART: set(), SUBSCRIBED: set()}
+    for object_id, kind in flag_rows:
+        flags[kind].add(object_id)
+
+    image_field = Recipe._meta.get_field('image')
+    # Автор нескольких рецептов страницы собирается один раз.
+    authors = {}
+
+    def author(recipe_id, fragment):
+        author_id = fragment['author']['id']
+        if author_id not in authors:
+            authors[author_id] = user_representation(
+                fragment['author'], request, author_id in flags[SUBSCRIBED]
+            )
+        return authors[author_id]
+
+    values = {
+        'author': author,
+        'is_favorited': lambda recipe_id, fragment: (
+            recipe_id in flags[FAVORITED]
+        ),
+        'is_in_shopping_cart': lambda recipe_id, fragment: (
+            recipe_id in flags[IN_SHOPPING_CART]
+        ),
+        'image': lambda recipe_id, fragment: media_url(
+            request, image_field, fragment['image']
+        ),
+    }
+    recipes = []
+    for recipe_id in ids:
+        fragment = fragments.get(recipe_id)
+        if fragment is None:
+            continue
+        recipes.append({
+            field: (
+                values[field](recipe_id, fragment) if field in values
+                else fragment[field]
+            )
+            for field in fields or RECIPE_RESPONSE_FIELDS
+        })
+    return recipes
@@ -4,15 +4,29 @@ from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.validators import UniqueTogetherValidator
 
+from api.constants import (CHANGES_PAGE_SIZE, MAX_CHANGES_PAGE_SIZE,
+                           MAX_PANTRY_INGREDIENTS)
 from api.fields import Base64ImageField
 from api.validators import PreventSelfSubscribeValidator
 from recipes.constants import MIN_AMOUNT, MIN_COOKING_TIME
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
+from recipes.signals import recipe_writes
 from users.models import Subscriptions, User
 
 
-class UserSerializer(DjoserUserSerializer):
+class SparseFieldsMixin:
+    """Оставляет поля из контекста 'fields' (ResponseFieldsMixin)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class UserSerializer(SparseFieldsMixin, DjoserUserSerializer):
     """Сериализатор пользователя."""
 
     is_subscribed = serializers.SerializerMethodField()
@@ -31,6 +45,9 @@ class UserSerializer(DjoserUserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            # Аннотация CustomUserViewSet.get_queryset.
+            return obj.is_subscribed
         request = self.context.get('request')
         user = request.user
         return (
@@ -134,6 +151,8 @@ class SubscriptionSerializer(UserSerializer):
         ).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
 
 
@@ -298,24 +317,42 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        recipe = Recipe.objects.create(**validated_data)
-        recipe.tags.set(tags)
-        self.helper_add_ingredients(recipe, ingredients)
+        with recipe_writes():
+            recipe = Recipe.objects.create(**validated_data)
+            recipe.tags.set(tags)
+            self.helper_add_ingredients(recipe, ingredients)
         return recipe
 
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
-        instance.tags.set(tags)
         self.helper_validate_ingredients(ingredients)
-        instance.recipeingredient_set.all().delete()
-        self.helper_add_ingredients(instance, ingredients)
-        return super().update(instance, validated_data)
+        with recipe_writes():
+            instance.tags.set(tags)
+            instance.recipeingredient_set.all().delete()
+            self.helper_add_ingredients(instance, ingredients)
+            return super().update(instance, validated_data)
 
     def to_representation(self, instance):
         return ReadRecipeSerializer(instance, context=self.context).data
 
 
+class BulkIngredientSerializer(serializers.Serializer):
+    """Ингредиент рецепта из пакета: существование проверяет create_recipes."""
+
+    id = serializers.IntegerField()
+    amount = serializers.IntegerField(
+        validators=[MinValueValidator(MIN_AMOUNT)]
+    )
+
+
+class BulkRecipeSerializer(CreateRecipeSerializer):
+    """Рецепт из пакета: проверка без запросов к БД."""
+
+    tags = serializers.ListField(child=serializers.IntegerField())
+    ingredients = BulkIngredientSerializer(many=True)
+
+
 class FavoriteSerializer(serializers.ModelSerializer):
     """Сериализатор добавления/удаления (2 ревью)."""
     class Meta:
@@ -337,3 +374,34 @@ class ShoppingSerializer(FavoriteSerializer):
     """Сериализатор добавления/удаления (2 ревью)."""
     class Meta(FavoriteSerializer.Meta):
         model = ShoppingCart
+
+
+class PantryQuerySerializer(serializers.Serializer):
+    """Параметры поиска по имеющимся продуктам."""
+
+    have = serializers.CharField()
+    missing_max = serializers.IntegerField(min_value=0, default=0)
+
+    def validate_have(self, have):
+        try:
+            ids = [int(item) for item in have.split(',') if item.strip()]
+        except ValueError:
+            raise ValidationError('Ожидаются id ингредиентов через запятую.')
+        if not ids:
+            raise ValidationError('Укажите хотя бы один ингредиент.')
+        if len(ids) > MAX_PANTRY_INGREDIENTS:
+            raise ValidationError(
+                f'Не больше {MAX_PANTRY_INGREDIENTS} ингредиентов.'
+            )
+        return ids
+
+
+class ChangesQuerySerializer(serializers.Serializer):
+    """Параметры выборки из журнала изменений рецептов."""
+
+    since = serializers.IntegerField(min_value=0, required=False)
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=MAX_CHANGES_PAGE_SIZE,
+        default=CHANGES_PAGE_SIZE,
+    )
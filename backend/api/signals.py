@@ -0,0 +1,30 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import invalidate_tokens, invalidate_user_tokens
+from api.representations import invalidate_fragments
+from recipes.signals import recipes_changed
+from users.models import User
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    # В т.ч. выход через djoser (token/logout), удаляющий токен пользователя.
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    # Смена пароля, деактивация и правка профиля делают снимок устаревшим.
+    if not created:
+        invalidate_user_tokens(instance.id)
+
+
+@receiver(recipes_changed)
+def recipes_content_changed(sender, recipe_ids, **kwargs):
+    # После коммита, иначе параллельный запрос закэширует старые данные.
+    transaction.on_commit(partial(invalidate_fragments, recipe_ids))
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import SimpleRouter
 
+from api import async_views
 from api.views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
                        TagViewSet)
 
@@ -16,3 +18,14 @@ urlpatterns = [
     path('', include(route.urls)),
     path('auth/', include('djoser.urls.authtoken')),
 ]
+
+if settings.ASYNC_READ_API:
+    urlpatterns = [
+        path('tags/', async_views.tag_list),
+        path('tags/<int:pk>/', async_views.tag_detail),
+        path('ingredients/', async_views.ingredient_list),
+        path('ingredients/<int:pk>/', async_views.ingredient_detail),
+        path('recipes/', async_views.recipe_list),
+        path('recipes/<int:pk>/', async_views.recipe_detail),
+        path('recipes/s/<str:short_link>/', async_views.recipe_short_link),
+    ] + urlpatterns
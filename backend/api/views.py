@@ -1,10 +1,12 @@
-from django.db.models import Sum
+from django.db.models import Count, Exists, OuterRef, Sum
 from django.http import FileResponse
 from django.shortcuts import get_object_or_404, redirect
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from rest_framework import filters, status, viewsets
+from rest_framework import filters, generics, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import (
     SAFE_METHODS,
     AllowAny,
@@ -13,25 +15,78 @@ from rest_framework.permissions import (
 )
 from rest_framework.response import Response
 
+from api.bulk import create_recipes
+from api.conditional import (list_etag, list_last_modified, not_modified,
+                             recipe_state_flags, recipe_state_queryset,
+                             recipe_validators, set_validators)
+from api.constants import LARGE_PAGE_SIZE, MAX_BULK_RECIPES
 from api.filters import IngredientFilter, RecipeFilter
-from api.pagination import LimitPageNumberPagination
+from api.fieldsets import normalize
+from api.mixins import (ConcurrencyLimitMixin, ReplicaReadMixin,
+                        ResponseFieldsMixin)
+from api.pagination import (KeysetPagination, LimitPageNumberPagination,
+                            RecipePagination)
+from api.parsers import NDJSONParser
 from api.permissions import IsAuthorOrReadOnly
-from api.serializers import (CreateRecipeSerializer, FavoriteSerializer,
-                             IngredientSerializer, ReadRecipeSerializer,
+from api.representations import (NORMALIZED_RECIPE_FIELDS, load_recipes,
+                                 user_flags)
+from api.serializers import (ChangesQuerySerializer, CreateRecipeSerializer,
+                             FavoriteSerializer, IngredientSerializer,
+                             PantryQuerySerializer, ReadRecipeSerializer,
                              ShoppingSerializer, SubscribeSerializer,
                              SubscriptionSerializer, TagSerializer,
                              UserSerializer)
-from recipes.models import (Ingredient, Recipe, RecipeIngredient, Tag)
+from recipes.changes import changes_since
+from recipes.feed import feed_page, feed_position
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            SimilarRecipe, Tag)
+from recipes.pantry import pantry_index
+from recipes.signals import recipe_writes
 from users.models import Subscriptions, User
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(
+    ResponseFieldsMixin, ConcurrencyLimitMixin, ReplicaReadMixin, UserViewSet
+):
     """Вьюсет для пользователей."""
 
     queryset = User.objects.all()
     serializer_class = UserSerializer
     pagination_class = LimitPageNumberPagination
     lookup_field = 'id'
+    normalized_fields = {'recipes': ('recipe_ids', 'recipes')}
+
+    def get_serializer_class(self):
+        if self.action == 'subscriptions':
+            return SubscriptionSerializer
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        return self.prune_queryset(queryset)
+
+    def prune_queryset(self, queryset):
+        """Только столбцы и аннотации, нужные для полей ответа."""
+        fields = self.response_fields() or self.available_fields()
+        columns = {field.name for field in User._meta.concrete_fields}
+        queryset = queryset.only(
+            'id', *(field for field in fields if field in columns)
+        )
+        user = self.request.user
+        if 'is_subscribed' in fields and user.is_authenticated:
+            queryset = queryset.annotate(is_subscribed=Exists(
+                Subscriptions.objects.filter(
+                    user=user, following=OuterRef('pk')
+                )
+            ))
+        if 'recipes_count' in fields:
+            # С GROUP BY сортировка Meta.ordering не применяется.
+            queryset = queryset.annotate(
+                recipes_count=Count('recipes')
+            ).order_by(*User._meta.ordering)
+        return queryset
 
     @action(
         detail=False,
@@ -63,7 +118,9 @@ class CustomUserViewSet(UserViewSet):
             serializer.is_valid(raise_exception=True)
             serializer.save()
             return Response({'avatar': serializer.data.get('avatar')})
-        user.avatar.delete()
+        # Файл может быть общим с другими объектами: его удаляет gc_media.
+        user.avatar = None
+        user.save(update_fields=('avatar',))
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -73,14 +130,12 @@ class CustomUserViewSet(UserViewSet):
     )
     def subscriptions(self, request):
         user = request.user
-        queryset = User.objects.filter(followers__user=user)
-        pages = self.paginate_queryset(queryset)
-        serializer = SubscriptionSerializer(
-            pages,
-            many=True,
-            context={'request': request}
+        queryset = self.prune_queryset(
+            User.objects.filter(followers__user=user)
         )
-        return self.get_paginated_response(serializer.data)
+        pages = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(pages, many=True)
+        return self.list_response(serializer.data, self.paginator)
 
     @action(
         detail=True,
@@ -115,14 +170,18 @@ class CustomUserViewSet(UserViewSet):
         )
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(
+    ConcurrencyLimitMixin, ReplicaReadMixin, viewsets.ReadOnlyModelViewSet
+):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
     permission_classes = (AllowAny,)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(
+    ConcurrencyLimitMixin, ReplicaReadMixin, viewsets.ReadOnlyModelViewSet
+):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
@@ -132,21 +191,106 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (AllowAny,)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    ResponseFieldsMixin,
+    ConcurrencyLimitMixin,
+    ReplicaReadMixin,
+    viewsets.ModelViewSet
+):
     queryset = Recipe.objects.all()
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
-    pagination_class = LimitPageNumberPagination
+    pagination_class = RecipePagination
     permission_classes = (IsAuthorOrReadOnly, IsAuthenticatedOrReadOnly)
+    normalized_fields = NORMALIZED_RECIPE_FIELDS
 
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
             return ReadRecipeSerializer
         return CreateRecipeSerializer
 
+    def concurrency_key(self, request):
+        # Большие страницы ограничиваются отдельно от обычных.
+        key = super().concurrency_key(request)
+        if (
+            self.action == 'list'
+            and self.paginator.get_page_size(request) > LARGE_PAGE_SIZE
+        ):
+            key += '.large'
+        return key
+
+    def list(self, request, *args, **kwargs):
+        # Ответ собирается из .values() без ReadRecipeSerializer.
+        fields = self.response_fields()
+        queryset = self.filter_queryset(self.get_queryset())
+        if KeysetPagination.cursor_query_param in request.query_params:
+            # ?cursor= (в т.ч. пустой) — страницы без OFFSET и COUNT.
+            paginator = KeysetPagination()
+            ids = paginator.paginate_queryset(queryset, request)
+            count = None
+        else:
+            paginator = self.paginator
+            ids = self.paginate_queryset(queryset.values_list('id', flat=True))
+            count = paginator.page.paginator.count
+        flags = user_flags(request.user, ids, fields)
+        etag = list_etag(
+            request, list_last_modified(queryset), count, ids, flags
+        )
+        response = not_modified(request, etag)
+        if response is None:
+            response = self.list_response(
+                load_recipes(ids, request, flags, fields), paginator
+            )
+        return set_validators(response, etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        fields = self.response_fields()
+        state = generics.get_object_or_404(
+            recipe_state_queryset(request.user, fields),
+            pk=kwargs[self.lookup_field]
+        )
+        etag, last_modified = recipe_validators(state, fields)
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            response = Response(load_recipes(
+                [state['id']], request, recipe_state_flags(state), fields
+            )[0])
+        return set_validators(response, etag, last_modified)
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def perform_destroy(self, instance):
+        with recipe_writes():
+            instance.delete()
+
+    @action(
+        detail=False,
+        methods=('POST',),
+        permission_classes=(IsAuthenticated,),
+        parser_classes=(JSONParser, NDJSONParser),
+    )
+    def bulk(self, request):
+        # Массив JSON или NDJSON; ошибки — по номеру рецепта в пакете.
+        if not isinstance(request.data, list):
+            raise ValidationError('Ожидается список рецептов.')
+        if len(request.data) > MAX_BULK_RECIPES:
+            raise ValidationError(
+                f'Не больше {MAX_BULK_RECIPES} рецептов за запрос.'
+            )
+        created, errors = create_recipes(
+            request.data, request.user, self.get_serializer_context()
+        )
+        if not errors:
+            response_status = status.HTTP_201_CREATED
+        elif not created:
+            response_status = status.HTTP_400_BAD_REQUEST
+        else:
+            response_status = status.HTTP_207_MULTI_STATUS
+        return Response(
+            {'created': created, 'errors': errors}, status=response_status
+        )
+
     def helper_shoping_favorite(self, pk, serializer_class):
         user = self.request.user
         recipe = get_object_or_404(Recipe, pk=pk)
@@ -225,6 +369,89 @@ class RecipeViewSet(viewsets.ModelViewSet):
         ).order_by('ingredient__name')
         return self.get_export_file(ingredients)
 
+    @action(
+        detail=False,
+        methods=('GET',),
+        permission_classes=(IsAuthenticated,),
+    )
+    def feed(self, request):
+        paginator = KeysetPagination()
+        ids = paginator.paginate(
+            request,
+            lambda position, limit: [
+                ((add_at, recipe_id), recipe_id)
+                for add_at, recipe_id in feed_page(
+                    request.user, position, limit
+                )
+            ],
+            feed_position
+        )
+        return self.list_response(
+            load_recipes(ids, request, fields=self.response_fields()),
+            paginator
+        )
+
+    @action(
+        detail=False,
+        methods=('GET',),
+    )
+    def pantry(self, request):
+        # ?have=1,2,3&missing_max=2: по доле имеющихся ингредиентов.
+        params = PantryQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        ids = self.paginate_queryset(pantry_index.search(
+            params.validated_data['have'],
+            params.validated_data['missing_max']
+        ))
+        return self.list_response(
+            load_recipes(ids, request, fields=self.response_fields()),
+            self.paginator
+        )
+
+    @action(
+        detail=False,
+        methods=('GET',),
+    )
+    def changes(self, request):
+        # ?since=<token>: изменённые рецепты и id удалённых после token.
+        params = ChangesQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        changed, deleted, token, more = changes_since(
+            params.validated_data.get('since'),
+            params.validated_data['limit']
+        )
+        recipes = load_recipes(changed, request, fields=self.response_fields())
+        included = {}
+        if self.normalized():
+            recipes, included = normalize(recipes, self.normalized_fields)
+        return Response({
+            'token': str(token),
+            'has_more': more,
+            'results': recipes,
+            'deleted': deleted,
+            **included,
+        })
+
+    @action(
+        detail=True,
+        methods=('GET',),
+    )
+    def similar(self, request, pk):
+        # Список строит команда rebuild_similar.
+        try:
+            ids = list(SimilarRecipe.objects.filter(
+                recipe_id=pk
+            ).order_by('-score', 'similar_id').values_list(
+                'similar_id', flat=True
+            ))
+        except ValueError:
+            raise NotFound()
+        if not ids:
+            get_object_or_404(Recipe, pk=pk)
+        return self.list_response(
+            load_recipes(ids, request, fields=self.response_fields())
+        )
+
     @action(
         detail=True,
         methods=('GET',),
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class BlobsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'blobs'
+    verbose_name = 'Медиафайлы'
+
+    def ready(self):
+        from blobs import signals  # noqa: F401
@@ -0,0 +1,132 @@
+"""Удаление медиафайлов, на которые не ссылаются модели (mark-and-sweep).
+
+Mark: пути из полей REFERENCES читаются пачками в множество хэшей строк
+(коллизия лишь оставит лишний файл). Sweep: каталоги upload_to этих полей
+обходятся через os.scandir в порядке сортировки путей. Файл удаляется,
+если на него нет ссылки, он не менялся дольше grace-периода (загрузка
+ещё может быть не сохранена в модели) и его счётчик Blob равен нулю.
+
+Пройденная позиция сохраняется в SweepCheckpoint, и следующий запуск
+продолжает с неё: миллионы файлов можно обходить частями.
+"""
+import os
+import time
+from collections import Counter
+
+from django.apps import apps
+from django.db.models import Q
+
+from blobs.models import Blob, SweepCheckpoint
+from blobs.references import REFERENCES
+
+
+def referenced_hashes(batch_size):
+    hashes = set()
+    for model_name, field in REFERENCES:
+        names = apps.get_model(model_name).objects.exclude(
+            Q(**{field: ''}) | Q(**{f'{field}__isnull': True})
+        ).order_by().values_list(field, flat=True)
+        hashes.update(
+            hash(name) for name in names.iterator(chunk_size=batch_size)
+        )
+    return hashes
+
+
+def sweep_roots():
+    """Каталоги upload_to полей со ссылками, как кортежи частей пути."""
+    return sorted({
+        tuple(filter(None, apps.get_model(model_name)._meta.get_field(
+            field
+        ).upload_to.split('/')))
+        for model_name, field in REFERENCES
+    })
+
+
+def walk(root, parts, after):
+    """Файлы каталога parts, идущие в порядке обхода после after."""
+    try:
+        entries = sorted(
+            os.scandir(os.path.join(root, *parts)),
+            key=lambda entry: entry.name
+        )
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        path = (*parts, entry.name)
+        if entry.is_dir(follow_symlinks=False):
+            # Каталог целиком до позиции after пропускается.
+            if path >= after[:len(path)]:
+                yield from walk(root, path, after)
+        elif entry.is_file(follow_symlinks=False) and path > after:
+            yield path, entry
+
+
+def delete_files(candidates, stats, dry_run):
+    """Удаляет кандидатов, если счётчик Blob не появился после mark."""
+    protected = set(Blob.objects.filter(
+        name__in=list(candidates), refcount__gt=0
+    ).values_list('name', flat=True))
+    stats['protected'] += len(protected)
+    deleted = []
+    for name, (path, size) in candidates.items():
+        if name in protected:
+            continue
+        if not dry_run:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+        deleted.append(name)
+        stats['deleted'] += 1
+        stats['freed'] += size
+    if not dry_run:
+        Blob.objects.filter(name__in=deleted, refcount=0).delete()
+    candidates.clear()
+
+
+def collect_media(root, grace, dry_run=False, max_files=None, restart=False,
+                  batch_size=1000):
+    """Один проход очистки; возвращает (статистику, завершён ли обход)."""
+    checkpoint = SweepCheckpoint.objects.first()
+    if restart and checkpoint is not None:
+        if not dry_run:
+            checkpoint.delete()
+        checkpoint = None
+    after = tuple(checkpoint.position.split('/')) if checkpoint else ()
+    referenced = referenced_hashes(batch_size)
+    modified_before = time.time() - grace.total_seconds()
+    stats, candidates = Counter(), {}
+
+    def save_position(position):
+        nonlocal checkpoint
+        delete_files(candidates, stats, dry_run)
+        if dry_run:
+            return
+        if checkpoint is None:
+            checkpoint = SweepCheckpoint()
+        checkpoint.position = position
+        checkpoint.save()
+
+    for media_root in sweep_roots():
+        if media_root < after[:len(media_root)]:
+            continue
+        for path, entry in walk(root, media_root, after):
+            position = '/'.join(path)
+            stats['scanned'] += 1
+            if hash(position) in referenced:
+                stats['referenced'] += 1
+            else:
+                stat = entry.stat(follow_symlinks=False)
+                if stat.st_mtime > modified_before:
+                    stats['recent'] += 1
+                else:
+                    candidates[position] = (entry.path, stat.st_size)
+            if stats['scanned'] % batch_size == 0:
+                save_position(position)
+            if max_files and stats['scanned'] >= max_files:
+                save_position(position)
+                return stats, False
+    delete_files(candidates, stats, dry_run)
+    if checkpoint is not None and not dry_run:
+        checkpoint.delete()
+    return stats, True
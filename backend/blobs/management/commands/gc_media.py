@@ -0,0 +1,60 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from blobs.gc import collect_media
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete media files that are not referenced by recipe images '
+        'or user avatars; an interrupted run continues where it stopped'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report what would be deleted',
+        )
+        parser.add_argument(
+            '--grace-hours',
+            type=float,
+            default=settings.MEDIA_GC_GRACE_HOURS,
+            help='Keep files modified more recently than this',
+        )
+        parser.add_argument(
+            '--max-files',
+            type=int,
+            help='Stop after scanning this many files and save the position',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore the saved position and scan from the beginning',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        stats, finished = collect_media(
+            settings.MEDIA_ROOT,
+            timedelta(hours=options['grace_hours']),
+            dry_run=options['dry_run'],
+            max_files=options['max_files'],
+            restart=options['restart'],
+            batch_size=options['batch_size'],
+        )
+        verb = 'would be deleted' if options['dry_run'] else 'deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'Scanned {stats["scanned"]} files in '
+            f'{time.perf_counter() - started:.2f}s: '
+            f'{stats["referenced"]} referenced, {stats["recent"]} recent, '
+            f'{stats["protected"]} protected by refcount, '
+            f'{stats["deleted"]} {verb} '
+            f'({stats["freed"] / 2 ** 20:.1f} MiB).'
+        ))
+        if not finished:
+            self.stdout.write('The scan is incomplete, run again to continue.')
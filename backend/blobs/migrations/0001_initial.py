@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Путь')),
+                ('refcount', models.PositiveIntegerField(default=0, verbose_name='Число ссылок')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Изменён')),
+            ],
+            options={
+                'verbose_name': 'Файл',
+                'verbose_name_plural': 'Файлы',
+                'indexes': [models.Index(fields=['refcount', 'updated_at'], name='blob_refcount_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+from collections import Counter
+
+from django.db import migrations
+from django.db.models import Count
+
+REFERENCES = (
+    ('recipes', 'Recipe', 'image'),
+    ('users', 'User', 'avatar'),
+)
+
+
+def count_references(apps, schema_editor):
+    counts = Counter()
+    for app_label, model_name, field in REFERENCES:
+        counts.update(dict(
+            apps.get_model(app_label, model_name).objects.exclude(
+                **{field: ''}
+            ).exclude(**{f'{field}__isnull': True}).order_by().values_list(
+                field
+            ).annotate(count=Count('pk'))
+        ))
+    Blob = apps.get_model('blobs', 'Blob')
+    Blob.objects.bulk_create(
+        [Blob(name=name, refcount=count) for name, count in counts.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blobs', '0001_initial'),
+        ('recipes', '0008_similar_recipes'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
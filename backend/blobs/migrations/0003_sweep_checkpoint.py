@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blobs', '0002_count_references'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SweepCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.TextField(verbose_name='Путь')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Сохранена')),
+            ],
+            options={
+                'verbose_name': 'Контрольная точка очистки медиа',
+                'verbose_name_plural': 'Контрольные точки очистки медиа',
+            },
+        ),
+    ]
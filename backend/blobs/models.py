@@ -0,0 +1,36 @@
+from django.db import models
+
+
+class Blob(models.Model):
+    """Файл хранилища и число ссылок на него из полей моделей."""
+
+    name = models.CharField('Путь', max_length=255, unique=True)
+    refcount = models.PositiveIntegerField('Число ссылок', default=0)
+    updated_at = models.DateTimeField('Изменён', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'Файлы'
+        indexes = (
+            models.Index(
+                fields=('refcount', 'updated_at'),
+                name='blob_refcount_idx',
+            ),
+        )
+
+    def __str__(self):
+        return self.name
+
+
+class SweepCheckpoint(models.Model):
+    """Последний обработанный файл прерванного прохода gc_media."""
+
+    position = models.TextField('Путь')
+    updated_at = models.DateTimeField('Сохранена', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Контрольная точка очистки медиа'
+        verbose_name_plural = 'Контрольные точки очистки медиа'
+
+    def __str__(self):
+        return self.position
@@ -0,0 +1,65 @@
+"""Счётчики ссылок из полей моделей на файлы хранилища.
+
+Поддерживаются сигналами при сохранении и удалении объектов. Изменения
+в обход сигналов (bulk_create, update, отложенные поля) счётчики
+не видят: точные значения восстанавливает recount_blobs.
+"""
+from collections import Counter
+
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from blobs.models import Blob
+
+# (модель, поле) со ссылками на файлы.
+REFERENCES = (
+    ('recipes.Recipe', 'image'),
+    ('users.User', 'avatar'),
+)
+
+
+def change_references(names, delta):
+    """Меняет на delta счётчики файлов names (повторы учитываются)."""
+    counts = Counter(name for name in names if name)
+    if not counts:
+        return
+    if delta > 0:
+        Blob.objects.bulk_create(
+            [Blob(name=name) for name in counts], ignore_conflicts=True
+        )
+    for name, count in counts.items():
+        Blob.objects.filter(name=name).update(
+            refcount=F('refcount') + count * delta,
+            updated_at=timezone.now(),
+        )
+
+
+def referenced_names(apps=global_apps):
+    counts = Counter()
+    for model_name, field in REFERENCES:
+        counts.update(dict(
+            apps.get_model(model_name).objects.exclude(
+                **{field: ''}
+            ).exclude(**{f'{field}__isnull': True}).order_by().values_list(
+                field
+            ).annotate(count=Count('pk'))
+        ))
+    return counts
+
+
+@transaction.atomic
+def recount_blobs(apps=global_apps):
+    """Пересчитывает счётчики ссылок по текущим данным."""
+    blob_model = apps.get_model('blobs', 'Blob')
+    counts = referenced_names(apps)
+    blob_model.objects.bulk_create(
+        [blob_model(name=name) for name in counts], ignore_conflicts=True
+    )
+    blob_model.objects.exclude(refcount=0).update(refcount=0)
+    blobs = list(blob_model.objects.filter(name__in=list(counts)))
+    for blob in blobs:
+        blob.refcount = counts[blob.name]
+    blob_model.objects.bulk_update(blobs, ['refcount'], batch_size=1000)
+    return len(blobs)
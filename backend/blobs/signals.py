@@ -0,0 +1,40 @@
+from django.db.models.signals import post_delete, post_init, post_save
+
+from blobs.references import REFERENCES, change_references
+
+
+def field_name(instance, field):
+    value = instance.__dict__.get(field)
+    return getattr(value, 'name', value)
+
+
+def connect(model_name, field):
+    def remember(sender, instance, **kwargs):
+        # Отложенное (only/defer) поле неизвестно: изменения не считаются.
+        if field in instance.__dict__:
+            instance._blob_names = {
+                **getattr(instance, '_blob_names', {}),
+                field: field_name(instance, field),
+            }
+
+    def saved(sender, instance, created, **kwargs):
+        names = getattr(instance, '_blob_names', {})
+        if not created and field not in names:
+            return
+        old = None if created else names[field]
+        new = field_name(instance, field)
+        if old != new:
+            change_references([old], -1)
+            change_references([new], 1)
+        instance._blob_names = {**names, field: new}
+
+    def deleted(sender, instance, **kwargs):
+        change_references([field_name(instance, field)], -1)
+
+    post_init.connect(remember, sender=model_name, weak=False)
+    post_save.connect(saved, sender=model_name, weak=False)
+    post_delete.connect(deleted, sender=model_name, weak=False)
+
+
+for model_name, field in REFERENCES:
+    connect(model_name, field)
@@ -0,0 +1,64 @@
+"""Хранилище медиафайлов с адресацией по содержимому.
+
+Файл сохраняется по пути <каталог upload_to>/ab/cd/<sha256><расширение>:
+одинаковое содержимое хранится один раз, а если файл уже есть, запись
+на диск пропускается. Каталоги шардируются по первым байтам хэша.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def blob_name(self, name, digest):
+        directory, filename = posixpath.split(name)
+        stem, extension = os.path.splitext(filename)
+        if stem == digest:
+            # Уже адрес этого содержимого (например, файл из выгрузки).
+            return name
+        extension = extension.lower()
+        return posixpath.join(
+            directory, digest[:2], digest[2:4], digest + extension
+        )
+
+    def get_available_name(self, name, max_length=None):
+        # Имя задаёт содержимое: совпадение имён — тот же файл.
+        return name
+
+    def _save(self, name, content):
+        name = self.blob_name(name, content_hash(content))
+        if self.exists(name):
+            # Только метаданные: свежая ссылка на старый файл защищена
+            # от gc_media, как новая загрузка.
+            os.utime(self.path(name))
+            return name
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        if self.directory_permissions_mode is not None:
+            os.chmod(directory, self.directory_permissions_mode)
+        # Запись во временный файл и переименование: параллельная загрузка
+        # того же файла не увидит его недописанным.
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(chunk)
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
@@ -0,0 +1,52 @@
+"""Маршрутизация чтения на реплики БД с привязкой автора записи к primary.
+
+Чтение уходит на реплики только внутри запроса, для которого выставлен
+флаг replica_reads (безопасные запросы вьюсетов, см. api.mixins).
+После записи пользователь на REPLICA_STICKY_SECONDS читает с primary,
+чтобы сразу видеть свои изменения несмотря на задержку репликации.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_CACHE_KEY = 'db-sticky:{}'
+
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+def stick_to_primary(user_id):
+    if not settings.DATABASE_REPLICAS:
+        return
+    caches[settings.REPLICA_STICKY_CACHE].set(
+        STICKY_CACHE_KEY.format(user_id),
+        True,
+        settings.REPLICA_STICKY_SECONDS
+    )
+
+
+def can_read_from_replica(user):
+    if not settings.DATABASE_REPLICAS:
+        return False
+    return not (
+        user.is_authenticated
+        and caches[settings.REPLICA_STICKY_CACHE].get(
+            STICKY_CACHE_KEY.format(user.id)
+        )
+    )
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if replica_reads.get() and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
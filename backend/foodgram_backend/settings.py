@@ -1,6 +1,9 @@
+import json
 import os
+import tempfile
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from django.core.management.utils import get_random_secret_key
 from dotenv import load_dotenv
 
@@ -31,10 +34,13 @@ INSTALLED_APPS = [
     'recipes.apps.RecipesConfig',
     'users.apps.UsersConfig',
     'api.apps.ApiConfig',
+    'jobs.apps.JobsConfig',
+    'blobs.apps.BlobsConfig',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.profiling.ProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -66,14 +72,55 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram_backend.wsgi.application'
 
+# Асинхронные представления для чтения (запуск под ASGI-сервером).
+ASYNC_READ_API = os.getenv('ASYNC_READ_API', 'False') == 'True'
+
+
+DATABASE_REPLICAS = []
 
 if os.getenv('USE_SQLITE', 'True') == 'True':
+    # Режим для нескольких воркеров (foodgram_backend/sqlite): WAL — читатели
+    # не ждут писателя, BEGIN IMMEDIATE — писатели ждут друг друга
+    # SQLITE_BUSY_TIMEOUT мс вместо ошибки «database is locked».
+    SQLITE_CONCURRENT_OPTIONS = {
+        'init_command': ';'.join((
+            'PRAGMA journal_mode=WAL',
+            'PRAGMA synchronous=NORMAL',
+            'PRAGMA busy_timeout={}'.format(
+                int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))
+            ),
+            # Байт на соединение; 0 отключает mmap.
+            'PRAGMA mmap_size={}'.format(
+                int(os.getenv('SQLITE_MMAP_SIZE', 128 * 1024 * 1024))
+            ),
+            # Отрицательное значение — размер в КиБ.
+            'PRAGMA cache_size=-{}'.format(
+                int(os.getenv('SQLITE_CACHE_KIB', 32 * 1024))
+            ),
+            'PRAGMA temp_store=MEMORY',
+        )),
+        'transaction_mode': 'IMMEDIATE',
+    }
+    SQLITE_OPTIONS = (
+        SQLITE_CONCURRENT_OPTIONS
+        if os.getenv('SQLITE_CONCURRENT', 'True') == 'True' else {}
+    )
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.sqlite3',
+            'ENGINE': 'foodgram_backend.sqlite',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': SQLITE_OPTIONS,
         }
     }
+    # Копия основной БД, заменяющая реплику при локальной проверке.
+    if os.getenv('SQLITE_REPLICA_NAME'):
+        DATABASES['replica'] = {
+            'ENGINE': 'foodgram_backend.sqlite',
+            'NAME': BASE_DIR / os.getenv('SQLITE_REPLICA_NAME'),
+            'OPTIONS': SQLITE_OPTIONS,
+            'TEST': {'MIRROR': 'default'},
+        }
+        DATABASE_REPLICAS.append('replica')
 else:
     DATABASES = {
         'default': {
@@ -85,6 +132,43 @@ else:
             'PORT': os.getenv('DB_PORT', 5432)
         }
     }
+    replica_hosts = os.getenv('DB_REPLICA_HOSTS', '')
+    for number, host in enumerate(filter(None, replica_hosts.split(','))):
+        alias = f'replica_{number}'
+        DATABASES[alias] = {
+            **DATABASES['default'],
+            'HOST': host,
+            'TEST': {'MIRROR': 'default'},
+        }
+        DATABASE_REPLICAS.append(alias)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Общий для всех воркеров кэш (например, Redis или Memcached).
+if os.getenv('SHARED_CACHE_BACKEND'):
+    CACHES['shared'] = {
+        'BACKEND': os.getenv('SHARED_CACHE_BACKEND'),
+        'LOCATION': os.getenv('SHARED_CACHE_LOCATION', ''),
+    }
+
+DATABASE_ROUTERS = ['foodgram_backend.db_router.ReplicaRouter']
+
+# Сколько секунд после записи пользователь читает только с primary.
+# Метка должна быть видна всем воркерам, поэтому по умолчанию — в общем
+# кэше; default (память процесса) годится только для одного процесса.
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+REPLICA_STICKY_CACHE = os.getenv(
+    'REPLICA_STICKY_CACHE', 'shared' if 'shared' in CACHES else None
+)
+if DATABASE_REPLICAS and REPLICA_STICKY_CACHE is None:
+    raise ImproperlyConfigured(
+        'Реплики требуют общего кэша: задайте SHARED_CACHE_BACKEND '
+        '(или REPLICA_STICKY_CACHE=default для одного процесса).'
+    )
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -128,6 +212,19 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Медиафайлы хранятся один раз по хэшу содержимого.
+STORAGES = {
+    'default': {
+        'BACKEND': 'blobs.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+# Файлы моложе этого не удаляются gc_media: загрузка может быть ещё
+# не сохранена в модели.
+MEDIA_GC_GRACE_HOURS = float(os.getenv('MEDIA_GC_GRACE_HOURS', 24))
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -140,7 +237,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -148,6 +245,98 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.LimitPageNumberPagination',
 }
 
+# Одновременные запросы к действию API на одном узле (ключ
+# «basename.action»): limit, очередь queue_timeout с, затем 503
+# с Retry-After. В CONCURRENCY_LIMITS окружения — JSON с теми же ключами.
+CONCURRENCY_LIMITS = {
+    'recipes.download_shopping_cart': {'limit': 2, 'queue_timeout': 1},
+    'recipes.list.large': {'limit': 2, 'queue_timeout': 1},
+    'recipes.bulk': {'limit': 1, 'queue_timeout': 5},
+    **json.loads(os.getenv('CONCURRENCY_LIMITS', '{}')),
+}
+CONCURRENCY_LOCK_DIR = os.getenv(
+    'CONCURRENCY_LOCK_DIR',
+    os.path.join(tempfile.gettempdir(), 'foodgram-concurrency')
+)
+
+# Кэш не зависящей от пользователя части рецептов. Сброс должен доходить
+# до всех воркеров, поэтому без общего кэша фрагменты не кэшируются;
+# default (память процесса) годится только для одного процесса.
+RECIPE_FRAGMENT_CACHE = os.getenv(
+    'RECIPE_FRAGMENT_CACHE', 'shared' if 'shared' in CACHES else ''
+)
+RECIPE_FRAGMENT_TTL = int(os.getenv('RECIPE_FRAGMENT_TTL', 300))
+
+# Число рецептов (count) на страницах ?page=: exact — COUNT(*) на каждый
+# запрос, cached — COUNT(*) в кэше на PAGINATION_COUNT_TTL с, estimated —
+# выборки больше PAGINATION_ESTIMATE_THRESHOLD оценивает PostgreSQL.
+PAGINATION_COUNT = os.getenv('PAGINATION_COUNT', 'exact')
+PAGINATION_COUNT_TTL = int(os.getenv('PAGINATION_COUNT_TTL', 10))
+PAGINATION_COUNT_CACHE = os.getenv(
+    'PAGINATION_COUNT_CACHE', 'shared' if 'shared' in CACHES else 'default'
+)
+PAGINATION_ESTIMATE_THRESHOLD = int(
+    os.getenv('PAGINATION_ESTIMATE_THRESHOLD', 10000)
+)
+
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', 30))
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 1024))
+AUTH_TOKEN_SHARED_CACHE = os.getenv('AUTH_TOKEN_SHARED_CACHE') or None
+AUTH_TOKEN_SHARED_CACHE_TTL = int(
+    os.getenv('AUTH_TOKEN_SHARED_CACHE_TTL', 300)
+)
+
+# Профилирование запросов сотрудников по токену (manage.py profile_token);
+# профили смотрит manage.py profiles.
+PROFILING = os.getenv('PROFILING', 'True') == 'True'
+PROFILING_DIR = os.getenv('PROFILING_DIR', BASE_DIR / 'profiles')
+PROFILING_TOKEN_MAX_AGE = int(os.getenv('PROFILING_TOKEN_MAX_AGE', 3600))
+PROFILING_MAX_PROFILES = int(os.getenv('PROFILING_MAX_PROFILES', 100))
+
+# Фоновые задачи (manage.py run_worker). JOBS_RUN_INLINE=True выполняет
+# их сразу после коммита в том же процессе — для разработки без воркера.
+JOBS_RUN_INLINE = os.getenv('JOBS_RUN_INLINE', 'False') == 'True'
+JOBS_WORKER_PROCESSES = int(os.getenv('JOBS_WORKER_PROCESSES', 2))
+JOBS_POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', 1))
+JOBS_LEASE_SECONDS = int(os.getenv('JOBS_LEASE_SECONDS', 600))
+JOBS_MAX_ATTEMPTS = int(os.getenv('JOBS_MAX_ATTEMPTS', 3))
+JOBS_RETRY_DELAY = int(os.getenv('JOBS_RETRY_DELAY', 10))
+JOBS_KEEP_DONE_DAYS = int(os.getenv('JOBS_KEEP_DONE_DAYS', 7))
+
+# Лента подписок: до скольких подписчиков рецепт раскладывается по лентам.
+FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv('FEED_FANOUT_MAX_FOLLOWERS', 10000))
+FEED_PULL_AUTHORS_TTL = int(os.getenv('FEED_PULL_AUTHORS_TTL', 300))
+FEED_BACKFILL_LIMIT = int(os.getenv('FEED_BACKFILL_LIMIT', 100))
+FEED_BATCH_SIZE = 1000
+
+# Популярность рецептов: период полураспада вклада события и задержка,
+# после которой событие учитывается командой refresh_popularity.
+POPULARITY_HALF_LIFE_DAYS = float(os.getenv('POPULARITY_HALF_LIFE_DAYS', 7))
+POPULARITY_LAG_SECONDS = int(os.getenv('POPULARITY_LAG_SECONDS', 60))
+POPULARITY_BATCH_SIZE = 1000
+
+# Похожие рецепты: сколько хранить на рецепт и размер блока произведения
+# матриц (ячеек), ограничивающий память команды rebuild_similar.
+SIMILAR_RECIPES_COUNT = int(os.getenv('SIMILAR_RECIPES_COUNT', 10))
+SIMILAR_RECIPES_BLOCK_CELLS = int(
+    os.getenv('SIMILAR_RECIPES_BLOCK_CELLS', 4_000_000)
+)
+SIMILAR_RECIPES_BATCH_SIZE = 1000
+
+# Поиск по имеющимся продуктам: как часто индекс в памяти процесса
+# подхватывает изменения других процессов и строится заново (секунды).
+PANTRY_INDEX_SYNC_SECONDS = float(os.getenv('PANTRY_INDEX_SYNC_SECONDS', 1))
+PANTRY_INDEX_TTL = int(os.getenv('PANTRY_INDEX_TTL', 3600))
+PANTRY_INDEX_BATCH_SIZE = 10000
+
+# Журнал изменений рецептов (/api/recipes/changes/): курсор продвигается
+# только по записям старше RECIPE_CHANGES_SETTLE_SECONDS секунд
+# (записи добавляются после коммита, так что длина транзакций не важна).
+RECIPE_CHANGES_SETTLE_SECONDS = int(
+    os.getenv('RECIPE_CHANGES_SETTLE_SECONDS', 5)
+)
+RECIPE_CHANGES_BATCH_SIZE = 500
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
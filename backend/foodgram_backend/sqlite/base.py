@@ -0,0 +1,59 @@
+"""SQLite для нескольких воркеров gunicorn.
+
+Добавляет параметры OPTIONS, которые появились в Django 5.1:
+init_command — команды через «;», выполняемые на каждом новом соединении
+(PRAGMA журнала, синхронизации, кэша), и transaction_mode — режим BEGIN
+транзакций atomic(). С IMMEDIATE транзакция сразу берёт блокировку записи
+и ждёт её busy_timeout, а не падает с «database is locked», когда
+читавшая транзакция начинает писать.
+"""
+from contextlib import contextmanager
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'EXCLUSIVE', 'IMMEDIATE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    init_command = None
+    transaction_mode = None
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        # Параметры обёртки, а не sqlite3.connect().
+        self.init_command = params.pop('init_command', None)
+        self.transaction_mode = params.pop('transaction_mode', None)
+        if (
+            self.transaction_mode is not None
+            and self.transaction_mode.upper() not in TRANSACTION_MODES
+        ):
+            raise ImproperlyConfigured(
+                f'transaction_mode: ожидается один из {TRANSACTION_MODES}.'
+            )
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for command in (self.init_command or '').split(';'):
+            if command.strip():
+                conn.execute(command)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            return super()._start_transaction_under_autocommit()
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
+
+    @contextmanager
+    def deferred_transactions(self):
+        """atomic() в блоке начинается BEGIN DEFERRED: долгие чтения
+        не держат блокировку записи, а в WAL видят один снимок БД."""
+        # Новое соединение перечитывает режим из OPTIONS.
+        self.ensure_connection()
+        mode, self.transaction_mode = self.transaction_mode, 'DEFERRED'
+        try:
+            yield
+        finally:
+            self.transaction_mode = mode
@@ -0,0 +1,105 @@
+"""Прогрев приложения до fork воркеров gunicorn (preload_app).
+
+Django и DRF многое строят лениво, на первых запросах: резолверы URL,
+поля сериализаторов и метаданные моделей, цепочку middleware, рендереры.
+Там же строится индекс поиска по продуктам (recipes.pantry). Прогретое
+в мастере воркеры получают при fork готовым.
+"""
+import inspect
+import io
+import sys
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connections
+from django.urls import get_resolver
+from rest_framework import serializers
+
+# Каталоги тегов и ингредиентов и первая страница рецептов.
+WARM_UP_PATHS = ('/api/tags/', '/api/ingredients/', '/api/recipes/?limit=1')
+
+
+def warm_up_host():
+    for host in settings.ALLOWED_HOSTS:
+        if host and host != '*' and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+def wsgi_get(application, path):
+    """GET-запрос к WSGI-приложению в обход сети; возвращает статус."""
+    url = urlsplit(path)
+    host = warm_up_host()
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'SERVER_NAME': host,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': host,
+        'HTTP_ACCEPT': 'application/json',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    statuses = []
+    result = application(
+        environ, lambda status, headers, exc_info=None: statuses.append(status)
+    )
+    try:
+        b''.join(result)
+    finally:
+        # Как у сервера: request_finished закрывает соединения с БД.
+        result.close()
+    return int(statuses[0].split()[0])
+
+
+def populate_resolvers(resolver=None):
+    resolver = resolver or get_resolver()
+    resolver.reverse_dict
+    for _, namespace_resolver in resolver.namespace_dict.values():
+        populate_resolvers(namespace_resolver)
+
+
+def build_serializer_fields():
+    # Заодно строятся кэши _meta моделей (дерево связей и т.п.).
+    from api import serializers as api_serializers
+    for serializer_class in vars(api_serializers).values():
+        if (
+            inspect.isclass(serializer_class)
+            and issubclass(serializer_class, serializers.Serializer)
+            and serializer_class.__module__ == api_serializers.__name__
+        ):
+            serializer_class().fields
+
+
+def build_pantry_index():
+    from recipes.pantry import pantry_index
+    pantry_index.build()
+
+
+def warm_up(application):
+    """Прогревает приложение; возвращает длительность шагов в секундах."""
+    timings = {}
+
+    def step(name, func, *args):
+        started = time.perf_counter()
+        func(*args)
+        timings[name] = time.perf_counter() - started
+
+    try:
+        step('resolvers', populate_resolvers)
+        step('serializers', build_serializer_fields)
+        step('pantry', build_pantry_index)
+        for path in WARM_UP_PATHS:
+            step(path, wsgi_get, application, path)
+    finally:
+        # Соединения мастера не должны достаться воркерам.
+        connections.close_all()
+    return timings
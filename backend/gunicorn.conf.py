@@ -0,0 +1,28 @@
+"""Настройки gunicorn: приложение загружается и прогревается до fork."""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:10000')
+workers = int(os.getenv(
+    'GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1
+))
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+# Воркеры наследуют импортированные модули и прогретые структуры.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+accesslog = '-'
+
+
+def when_ready(server):
+    # Мастер, приложение уже загружено, воркеры ещё не запущены.
+    if not preload_app or os.getenv('GUNICORN_WARM_UP', 'True') != 'True':
+        return
+    from foodgram_backend.warmup import warm_up
+    try:
+        timings = warm_up(server.app.wsgi())
+    except Exception:
+        server.log.exception('Прогрев не удался, воркеры стартуют без него')
+        return
+    server.log.info('Прогрев: %s', ', '.join(
+        f'{name} {seconds * 1000:.0f} мс' for name, seconds in timings.items()
+    ))
@@ -0,0 +1,52 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import queue_stats
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'id',
+        'task',
+        'status',
+        'priority',
+        'run_at',
+        'attempts',
+        'latency_display',
+        'duration_display',
+    )
+    list_filter = ('status', 'task')
+    search_fields = ('task', 'dedup_key')
+    readonly_fields = (
+        'created_at',
+        'started_at',
+        'finished_at',
+        'locked_by',
+        'locked_until',
+        'last_error',
+    )
+    actions = ('retry',)
+
+    @admin.display(description='Ожидание запуска')
+    def latency_display(self, obj):
+        if obj.started_at:
+            return obj.started_at - obj.run_at
+
+    @admin.display(description='Выполнение')
+    def duration_display(self, obj):
+        if obj.started_at and obj.finished_at:
+            return obj.finished_at - obj.started_at
+
+    @admin.action(description='Повторить выбранные задачи')
+    def retry(self, request, queryset):
+        queryset.exclude(status=Job.Status.RUNNING).update(
+            status=Job.Status.PENDING,
+            run_at=timezone.now(),
+            attempts=0,
+        )
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {**(extra_context or {}), 'stats': queue_stats()}
+        return super().changelist_view(request, extra_context)
@@ -0,0 +1,2 @@
+MAX_LENGTH_TASK = 128
+MAX_LENGTH_DEDUP_KEY = 128
@@ -0,0 +1,96 @@
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from jobs.queue import prune_jobs, run_next, worker_name
+
+# Как часто надзирающий процесс проверяет, живы ли воркеры (секунды).
+SUPERVISE_INTERVAL = 1
+# Как часто воркер удаляет старые выполненные задачи (секунды).
+PRUNE_INTERVAL = 3600
+
+
+def stop_on_signals():
+    """Флаг, который выставляют SIGTERM и SIGINT."""
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    return stopping
+
+
+def work():
+    # Текущая задача дорабатывает, новые не берутся.
+    stopping = stop_on_signals()
+    worker = worker_name()
+    pruned_at = 0
+    while not stopping:
+        close_old_connections()
+        if run_next(worker):
+            continue
+        if time.monotonic() - pruned_at > PRUNE_INTERVAL:
+            prune_jobs()
+            pruned_at = time.monotonic()
+        time.sleep(settings.JOBS_POLL_INTERVAL)
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs from the database queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=settings.JOBS_WORKER_PROCESSES,
+            help='Number of worker processes',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run due jobs in this process until the queue is empty',
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            worker, count = worker_name(), 0
+            while run_next(worker):
+                count += 1
+            self.stdout.write(self.style.SUCCESS(f'{count} jobs were run.'))
+            return
+
+        context = multiprocessing.get_context('fork')
+        # Дочерние процессы не должны делить соединения с родителем.
+        connections.close_all()
+
+        def start():
+            process = context.Process(target=work, daemon=True)
+            process.start()
+            return process
+
+        processes = [start() for _ in range(options['processes'])]
+        stopping = stop_on_signals()
+        self.stdout.write(
+            f'Started {len(processes)} workers, press Ctrl+C to stop.'
+        )
+        while not stopping:
+            for index, process in enumerate(processes):
+                if not process.is_alive():
+                    self.stderr.write(
+                        f'Worker {process.pid} exited with code '
+                        f'{process.exitcode}, restarting.'
+                    )
+                    processes[index] = start()
+            time.sleep(SUPERVISE_INTERVAL)
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS('Workers stopped.'))
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:06
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task', models.CharField(max_length=128, verbose_name='Задача')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Аргументы')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('running', 'Выполняется'), ('done', 'Выполнена'), ('failed', 'Ошибка')], default='pending', max_length=16, verbose_name='Статус')),
+                ('priority', models.SmallIntegerField(default=0, help_text='Задачи с большим приоритетом выполняются раньше.', verbose_name='Приоритет')),
+                ('dedup_key', models.CharField(blank=True, max_length=128, null=True, verbose_name='Ключ дедупликации')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Запустить не раньше')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('max_attempts', models.PositiveSmallIntegerField(verbose_name='Максимум попыток')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создана')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начата')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершена')),
+                ('locked_by', models.CharField(blank=True, max_length=128, verbose_name='Воркер')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='Занята до')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+            ],
+            options={
+                'verbose_name': 'Задача',
+                'verbose_name_plural': 'Задачи',
+                'ordering': ('-id',),
+                'indexes': [models.Index(fields=['status', '-priority', 'run_at', 'id'], name='job_claim_idx'), models.Index(fields=['status', 'finished_at'], name='job_finished_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('dedup_key',), name='unique_pending_job_dedup_key'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+from django.db import models
+from django.utils import timezone
+
+from jobs.constants import MAX_LENGTH_DEDUP_KEY, MAX_LENGTH_TASK
+
+
+class Job(models.Model):
+    """Фоновая задача очереди."""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Ожидает'
+        RUNNING = 'running', 'Выполняется'
+        DONE = 'done', 'Выполнена'
+        FAILED = 'failed', 'Ошибка'
+
+    task = models.CharField('Задача', max_length=MAX_LENGTH_TASK)
+    payload = models.JSONField('Аргументы', default=dict, blank=True)
+    status = models.CharField(
+        'Статус',
+        max_length=16,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    priority = models.SmallIntegerField(
+        'Приоритет',
+        default=0,
+        help_text='Задачи с большим приоритетом выполняются раньше.',
+    )
+    dedup_key = models.CharField(
+        'Ключ дедупликации',
+        max_length=MAX_LENGTH_DEDUP_KEY,
+        null=True,
+        blank=True,
+    )
+    run_at = models.DateTimeField('Запустить не раньше', default=timezone.now)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Максимум попыток')
+    created_at = models.DateTimeField('Создана', auto_now_add=True)
+    started_at = models.DateTimeField('Начата', null=True, blank=True)
+    finished_at = models.DateTimeField('Завершена', null=True, blank=True)
+    locked_by = models.CharField('Воркер', max_length=128, blank=True)
+    locked_until = models.DateTimeField(
+        'Занята до', null=True, blank=True
+    )
+    last_error = models.TextField('Последняя ошибка', blank=True)
+
+    class Meta:
+        ordering = ('-id',)
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        indexes = (
+            models.Index(
+                fields=('status', '-priority', 'run_at', 'id'),
+                name='job_claim_idx',
+            ),
+            models.Index(
+                fields=('status', 'finished_at'),
+                name='job_finished_idx',
+            ),
+        )
+        constraints = (
+            # Одна ожидающая задача на ключ: повторная постановка — no-op.
+            models.UniqueConstraint(
+                fields=('dedup_key',),
+                condition=models.Q(status='pending'),
+                name='unique_pending_job_dedup_key',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.task} #{self.pk}'
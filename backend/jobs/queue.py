@@ -0,0 +1,235 @@
+"""Очередь фоновых задач в таблице Job, без внешнего брокера.
+
+Задача — функция, помеченная декоратором task, аргументы — JSON. Воркер
+(manage.py run_worker) забирает задачу через SELECT ... FOR UPDATE SKIP
+LOCKED, а если БД его не поддерживает (SQLite), — условным UPDATE
+по статусу и номеру попытки. Задача, чей воркер не отчитался за
+JOBS_LEASE_SECONDS, снова становится доступной, а если попытки
+исчерпаны — завершается ошибкой.
+"""
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import (Avg, Count, DurationField, ExpressionWrapper,
+                              F, Max, Min, Q)
+from django.utils import timezone
+
+from jobs.models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+# Сколько кандидатов перебирает захват без SKIP LOCKED.
+CLAIM_CANDIDATES = 10
+# Попыток постановки, если ожидающую задачу с тем же ключом забирают.
+ENQUEUE_ATTEMPTS = 3
+
+
+def task(func):
+    """Регистрирует функцию как фоновую задачу."""
+    func.task_name = f'{func.__module__}.{func.__qualname__}'
+    TASKS[func.task_name] = func
+    return func
+
+
+def enqueue(func, payload=None, *, priority=0, dedup_key=None, run_at=None,
+            max_attempts=None):
+    """Ставит задачу в очередь (видна воркерам после коммита).
+
+    Если ожидающая задача с тем же dedup_key уже есть, возвращает её;
+    если её раз за разом забирают воркеры — None.
+    При JOBS_RUN_INLINE задача выполняется сразу после коммита,
+    а возвращается None.
+    """
+    payload = payload or {}
+    if settings.JOBS_RUN_INLINE:
+        transaction.on_commit(partial(func, **payload))
+        return None
+    job = Job(
+        task=func.task_name,
+        payload=payload,
+        priority=priority,
+        dedup_key=dedup_key,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+    for _ in range(ENQUEUE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                job.save()
+            return job
+        except IntegrityError:
+            if dedup_key is None:
+                raise
+        pending = Job.objects.filter(
+            dedup_key=dedup_key, status=Job.Status.PENDING
+        ).first()
+        if pending is not None:
+            return pending
+        # Ожидающую задачу успел забрать воркер: ставим новую.
+    logger.warning('Не удалось поставить задачу с ключом %s', dedup_key)
+    return None
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def available_jobs(now):
+    return Job.objects.filter(
+        Q(status=Job.Status.PENDING, run_at__lte=now)
+        | Q(
+            status=Job.Status.RUNNING,
+            locked_until__lt=now,
+            attempts__lt=F('max_attempts'),
+        )
+    ).order_by('-priority', 'run_at', 'id')
+
+
+def fail_abandoned(now):
+    """Завершает ошибкой брошенные задачи, у которых не осталось попыток.
+
+    Так задача, которая убивает или вешает воркер, не повторяется вечно.
+    """
+    return Job.objects.filter(
+        status=Job.Status.RUNNING,
+        locked_until__lt=now,
+        attempts__gte=F('max_attempts'),
+    ).update(
+        status=Job.Status.FAILED,
+        finished_at=now,
+        locked_until=None,
+        last_error='Воркер не отчитался о последней попытке '
+                   f'за {settings.JOBS_LEASE_SECONDS} с.',
+    )
+
+
+def lock(job, now, worker):
+    job.status = Job.Status.RUNNING
+    job.attempts += 1
+    job.started_at = now
+    job.locked_by = worker
+    job.locked_until = now + timedelta(seconds=settings.JOBS_LEASE_SECONDS)
+
+
+def claim(worker):
+    """Забирает следующую задачу или возвращает None."""
+    now = timezone.now()
+    fail_abandoned(now)
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = available_jobs(now).select_for_update(
+                skip_locked=True
+            ).first()
+            if job is not None:
+                lock(job, now, worker)
+                job.save()
+            return job
+    for job in available_jobs(now)[:CLAIM_CANDIDATES]:
+        # Удалось, только если никто не забрал задачу раньше.
+        claimed = Job.objects.filter(
+            id=job.id, status=job.status, attempts=job.attempts
+        )
+        lock(job, now, worker)
+        if claimed.update(
+            status=job.status,
+            attempts=job.attempts,
+            started_at=job.started_at,
+            locked_by=job.locked_by,
+            locked_until=job.locked_until,
+        ):
+            return job
+    return None
+
+
+def finish(job, error=None):
+    """Сохраняет результат: готово, повтор позже или окончательная ошибка."""
+    now = timezone.now()
+    job.finished_at = now
+    job.locked_until = None
+    if error is None:
+        job.status = Job.Status.DONE
+    else:
+        job.last_error = error
+        job.status = Job.Status.FAILED
+        if job.attempts < job.max_attempts:
+            job.status = Job.Status.PENDING
+            job.run_at = now + timedelta(
+                seconds=settings.JOBS_RETRY_DELAY * 2 ** (job.attempts - 1)
+            )
+    running = Job.objects.filter(
+        id=job.id, status=Job.Status.RUNNING, locked_by=job.locked_by
+    )
+    fields = ('status', 'finished_at', 'locked_until', 'last_error', 'run_at')
+    try:
+        with transaction.atomic():
+            running.update(**{field: getattr(job, field) for field in fields})
+    except IntegrityError:
+        # Пока задача выполнялась, такую же поставили заново.
+        job.status = Job.Status.FAILED
+        running.update(**{field: getattr(job, field) for field in fields})
+
+
+def run(job):
+    func = TASKS.get(job.task)
+    try:
+        if func is None:
+            raise LookupError(f'Неизвестная задача {job.task}')
+        func(**job.payload)
+    except Exception:
+        logger.exception('Задача %s завершилась ошибкой', job)
+        finish(job, traceback.format_exc())
+    else:
+        finish(job)
+
+
+def run_next(worker):
+    """Выполняет одну задачу; False, если выполнять нечего."""
+    job = claim(worker)
+    if job is None:
+        return False
+    run(job)
+    return True
+
+
+def prune_jobs():
+    """Удаляет выполненные задачи старше JOBS_KEEP_DONE_DAYS."""
+    return Job.objects.filter(
+        status=Job.Status.DONE,
+        finished_at__lt=timezone.now() - timedelta(
+            days=settings.JOBS_KEEP_DONE_DAYS
+        ),
+    ).delete()[0]
+
+
+def queue_stats(window=timedelta(hours=1)):
+    """Глубина очереди и задержка запуска задач за последний window."""
+    now = timezone.now()
+    counts = dict(Job.objects.order_by().values_list('status').annotate(
+        count=Count('id')
+    ))
+    waiting = Job.objects.filter(status=Job.Status.PENDING, run_at__lte=now)
+    latency = Job.objects.filter(started_at__gte=now - window).annotate(
+        latency=ExpressionWrapper(
+            F('started_at') - F('run_at'), output_field=DurationField()
+        )
+    ).aggregate(
+        avg=Avg('latency'), max=Max('latency'), started=Count('id')
+    )
+    oldest = waiting.aggregate(run_at=Min('run_at'))['run_at']
+    return {
+        'counts': [
+            (status.label, counts.get(status, 0)) for status in Job.Status
+        ],
+        'due': waiting.count(),
+        'oldest_due_age': now - oldest if oldest else None,
+        'avg_latency': latency['avg'],
+        'max_latency': latency['max'],
+        'started': latency['started'],
+    }
@@ -0,0 +1,78 @@
+"""Журнал изменений рецептов для синхронизации: /api/recipes/changes/.
+
+Изменение рецепта, его ингредиентов или тегов записывает RecipeChange
+с новым id и удаляет прежние записи рецепта: в журнале по строке
+на рецепт, включая удалённые. Курсор клиента — id последней полученной
+записи, выборка после него идёт по первичному ключу.
+
+Записи добавляются после коммита изменившей рецепты транзакции
+(record_changes_on_commit), отдельной короткой транзакцией: changed_at —
+время коммита, даже если транзакция шла долго. Изменения, чей процесс
+упал между коммитом и записью, в журнал не попадут.
+
+id выдаются до коммита, и транзакция может зафиксировать меньший id
+позже большего. Поэтому курсор продвигается только по записям старше
+RECIPE_CHANGES_SETTLE_SECONDS; более свежие отдаются, но придут снова.
+"""
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from recipes.models import RecipeChange
+
+
+def record_changes(recipe_ids, deleted=False):
+    recipe_ids = sorted(set(recipe_ids))
+    batch_size = settings.RECIPE_CHANGES_BATCH_SIZE
+    for start in range(0, len(recipe_ids), batch_size):
+        batch = recipe_ids[start:start + batch_size]
+        with transaction.atomic():
+            changes = RecipeChange.objects.bulk_create([
+                RecipeChange(recipe_id=recipe_id, deleted=deleted)
+                for recipe_id in batch
+            ])
+            RecipeChange.objects.filter(
+                recipe_id__in=batch,
+                id__lt=min(change.id for change in changes)
+            ).delete()
+
+
+def record_changes_on_commit(recipe_ids, deleted=False):
+    """record_changes после коммита текущей транзакции."""
+    transaction.on_commit(partial(record_changes, set(recipe_ids), deleted))
+
+
+def changes_since(since, limit):
+    """Изменения после курсора since (None — все живые рецепты).
+
+    Возвращает (id изменённых, id удалённых, новый курсор, есть ли ещё).
+    """
+    changes = RecipeChange.objects.all()
+    if since is None:
+        # Первой синхронизации удалённые рецепты не нужны.
+        since = 0
+        changes = changes.filter(deleted=False)
+    rows = list(changes.filter(id__gt=since).values_list(
+        'id', 'recipe_id', 'deleted', 'changed_at'
+    )[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+    settled = timezone.now() - timedelta(
+        seconds=settings.RECIPE_CHANGES_SETTLE_SECONDS
+    )
+    token = since
+    for change_id, _, _, changed_at in rows:
+        if changed_at > settled:
+            break
+        token = change_id
+    # При гонке записей у рецепта бывает две строки: верна последняя.
+    latest = {recipe_id: deleted for _, recipe_id, deleted, _ in rows}
+    return (
+        [recipe_id for recipe_id, deleted in latest.items() if not deleted],
+        [recipe_id for recipe_id, deleted in latest.items() if deleted],
+        token,
+        more and token > since,
+    )
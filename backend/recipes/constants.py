@@ -5,3 +5,5 @@ MAX_LENGTH_INGREDIENT_NAME = 128
 MAX_LENGTH_INGREDIENT_MEASUREMENT_UNIT = 64
 MIN_AMOUNT = 1
 MIN_COOKING_TIME = 1
+# Старший бит маски тегов в BigIntegerField (бит 63 — знаковый).
+MAX_TAG_MASK_BIT = 62
@@ -0,0 +1,116 @@
+"""Лента подписок: fan-out при публикации и pull для популярных авторов.
+
+Рецепт автора с числом подписчиков не больше FEED_FANOUT_MAX_FOLLOWERS
+записывается в TimelineEntry каждого подписчика. Рецепты более
+популярных авторов в ленты не копируются и читаются напрямую из Recipe.
+"""
+import heapq
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils.dateparse import parse_datetime
+
+from recipes.models import Recipe, TimelineEntry
+from recipes.utils import keyset_filter
+from users.models import Subscriptions
+
+PULL_AUTHORS_CACHE_KEY = 'feed-pull-authors'
+FEED_ORDERING = ('-add_at', '-id')
+
+
+def pull_author_ids():
+    """Авторы, чьи рецепты читаются из Recipe, а не из лент."""
+    author_ids = cache.get(PULL_AUTHORS_CACHE_KEY)
+    if author_ids is None:
+        author_ids = set(
+            Subscriptions.objects.order_by().values('following').annotate(
+                followers_count=Count('id')
+            ).filter(
+                followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+            ).values_list('following', flat=True)
+        )
+        cache.set(
+            PULL_AUTHORS_CACHE_KEY, author_ids, settings.FEED_PULL_AUTHORS_TTL
+        )
+    return author_ids
+
+
+def fan_out_recipe(recipe):
+    if recipe.author_id in pull_author_ids():
+        return
+    follower_ids = Subscriptions.objects.filter(
+        following_id=recipe.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id, recipe_id=recipe.id, add_at=recipe.add_at
+            )
+            for user_id in follower_ids.iterator()
+        ),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_timeline(user_id, author_id):
+    if author_id in pull_author_ids():
+        return
+    recipes = Recipe.objects.filter(author_id=author_id).order_by(
+        *FEED_ORDERING
+    ).values_list('id', 'add_at')[:settings.FEED_BACKFILL_LIMIT]
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, recipe_id=recipe_id, add_at=add_at)
+            for recipe_id, add_at in recipes
+        ),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def prune_timeline(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
+
+
+def feed_position(position):
+    """(add_at, id) из курсора ленты; ValueError, если он не такой."""
+    if not isinstance(position, list) or len(position) != 2:
+        raise ValueError(position)
+    add_at, recipe_id = position
+    if not isinstance(add_at, str) or type(recipe_id) is not int:
+        raise ValueError(position)
+    add_at = parse_datetime(add_at)
+    if add_at is None:
+        raise ValueError(position)
+    return add_at, recipe_id
+
+
+def feed_page(user, position, limit):
+    """До limit пар (add_at, id) ленты пользователя после position."""
+    pushed = TimelineEntry.objects.filter(user=user).values_list(
+        'add_at', 'recipe_id'
+    ).order_by('-add_at', '-recipe_id')
+    pulled = Recipe.objects.filter(
+        author__in=Subscriptions.objects.filter(
+            user=user, following__in=pull_author_ids()
+        ).values('following')
+    ).values_list('add_at', 'id').order_by(*FEED_ORDERING)
+    if position is not None:
+        pushed = pushed.filter(
+            keyset_filter(('-add_at', '-recipe_id'), position)
+        )
+        pulled = pulled.filter(keyset_filter(FEED_ORDERING, position))
+
+    page, seen = [], set()
+    # Автор мог сменить режим: одна и та же запись приходит из обоих потоков.
+    for add_at, recipe_id in heapq.merge(
+        pushed[:limit], pulled[:limit], reverse=True
+    ):
+        if recipe_id not in seen:
+            seen.add(recipe_id)
+            page.append((add_at, recipe_id))
+    return page[:limit]
@@ -0,0 +1,153 @@
+import multiprocessing
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+
+from api.management.commands.bench_read_api import percentile
+from recipes.models import Favorite, Recipe
+from users.models import User
+
+# Режим: журнал копии БД и OPTIONS соединений.
+MODES = {
+    # Как у django.db.backends.sqlite3 без настроек.
+    'default': ('DELETE', {}),
+    'concurrent': ('WAL', None),
+}
+
+
+def copy_database(source, target, journal_mode):
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+        dst.execute(f'PRAGMA journal_mode={journal_mode}')
+    src.close()
+    dst.close()
+
+
+def toggle_favorite(user_id, recipe_id):
+    # Чтение и запись в одной транзакции, как при POST/DELETE favorite.
+    with transaction.atomic():
+        favorite = Favorite.objects.filter(
+            user_id=user_id, recipe_id=recipe_id
+        ).first()
+        if favorite is None:
+            Favorite.objects.create(user_id=user_id, recipe_id=recipe_id)
+        else:
+            favorite.delete()
+
+
+def read_page(user_id, recipe_id):
+    list(Recipe.objects.order_by('-id').values('id', 'name')[:6])
+    Favorite.objects.filter(user_id=user_id).count()
+
+
+def worker(name, options, duration, write_ratio, user_ids, recipe_ids,
+           seed, results):
+    # Процесс получает закрытое соединение родителя и меняет его БД.
+    connection.settings_dict.update(NAME=name, OPTIONS=options)
+    rng = random.Random(seed)
+    stats = {'reads': 0, 'writes': 0, 'locked': 0, 'latencies': []}
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        write = rng.random() < write_ratio
+        operation = toggle_favorite if write else read_page
+        started = time.perf_counter()
+        try:
+            operation(rng.choice(user_ids), rng.choice(recipe_ids))
+        except OperationalError:
+            stats['locked'] += 1
+            continue
+        stats['latencies'].append(time.perf_counter() - started)
+        stats['writes' if write else 'reads'] += 1
+    connection.close()
+    results.put(stats)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare throughput of concurrent reads and read-then-write '
+        'transactions on a copy of the SQLite database: Django defaults '
+        '(rollback journal, deferred BEGIN) against SQLITE_CONCURRENT_OPTIONS '
+        '(WAL, BEGIN IMMEDIATE, PRAGMA tuning)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument(
+            '--duration', type=float, default=10, help='Seconds per mode'
+        )
+        parser.add_argument(
+            '--write-ratio',
+            type=float,
+            default=0.2,
+            help='Share of operations that toggle a favorite',
+        )
+        parser.add_argument(
+            '--mode', action='append', choices=MODES, help='Default: all'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Only for USE_SQLITE=True.')
+        user_ids = list(User.objects.values_list('id', flat=True)[:200])
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True)[:200])
+        if not user_ids or not recipe_ids:
+            raise CommandError('Seed the database first (seed_recipes).')
+        source = connection.settings_dict['NAME']
+        # Дочерние процессы не должны унаследовать открытое соединение.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        throughput = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for mode in options['mode'] or MODES:
+                journal_mode, mode_options = MODES[mode]
+                if mode_options is None:
+                    mode_options = settings.SQLITE_CONCURRENT_OPTIONS
+                name = str(Path(directory) / f'{mode}.sqlite3')
+                copy_database(source, name, journal_mode)
+                results = context.Queue()
+                processes = [
+                    context.Process(target=worker, args=(
+                        name, mode_options, options['duration'],
+                        options['write_ratio'], user_ids, recipe_ids,
+                        number, results,
+                    ))
+                    for number in range(options['processes'])
+                ]
+                for process in processes:
+                    process.start()
+                stats = [results.get() for _ in processes]
+                for process in processes:
+                    process.join()
+                throughput[mode] = self.report(
+                    mode, stats, options['duration']
+                )
+        if len(throughput) == len(MODES) and throughput['default']:
+            self.stdout.write(self.style.SUCCESS(
+                'concurrent/default: {:.2f}x'.format(
+                    throughput['concurrent'] / throughput['default']
+                )
+            ))
+
+    def report(self, mode, stats, duration):
+        reads = sum(item['reads'] for item in stats)
+        writes = sum(item['writes'] for item in stats)
+        locked = sum(item['locked'] for item in stats)
+        latencies = sorted(
+            latency for item in stats for latency in item['latencies']
+        )
+        ops = (reads + writes) / duration
+        self.stdout.write(
+            f'{mode}: {ops:.0f} ops/s ({reads / duration:.0f} reads/s, '
+            f'{writes / duration:.0f} writes/s), '
+            f'"database is locked" {locked}, '
+            f'p50 {statistics.median(latencies or [0]) * 1000:.1f} ms, '
+            f'p99 {percentile(latencies or [0], 99) * 1000:.1f} ms'
+        )
+        return ops
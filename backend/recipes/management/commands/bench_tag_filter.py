@@ -0,0 +1,42 @@
+import time
+from itertools import combinations
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+
+from recipes.models import Recipe, Tag
+from recipes.utils import tags_mask
+
+
+class Command(BaseCommand):
+    help = 'Compare tag filtering by RecipeTag join and by tags_mask'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=6)
+
+    def handle(self, *args, **options):
+        tags = list(Tag.objects.values_list('id', 'slug'))
+        if not Recipe.objects.exists():
+            raise CommandError('Seed BD first (seed_recipes).')
+        for size in (1, 2, 3):
+            for selected in list(combinations(tags, size))[:3]:
+                ids = [tag_id for tag_id, _ in selected]
+                slugs = [slug for _, slug in selected]
+                join = Recipe.objects.filter(tags__slug__in=slugs).distinct()
+                mask = Recipe.objects.alias(
+                    tags_matched=F('tags_mask').bitand(tags_mask(ids))
+                ).filter(tags_matched__gt=0)
+                self.stdout.write(
+                    f'{",".join(slugs)}: '
+                    f'join {self.measure(join, options)} ms, '
+                    f'mask {self.measure(mask, options)} ms'
+                )
+
+    def measure(self, queryset, options):
+        started = time.perf_counter()
+        for _ in range(options['repeat']):
+            queryset.count()
+            list(queryset.values_list('id', flat=True)[:options['limit']])
+        elapsed = (time.perf_counter() - started) / options['repeat']
+        return f'{elapsed * 1000:.2f}'
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from recipes.transfer import (export_media, export_recipes, format_stats,
+                              open_ndjson)
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream users, recipes, favorites, carts and subscriptions '
+        'to an NDJSON file (see import_recipes)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            '-o',
+            default='-',
+            help='NDJSON file, "-" for stdout, *.gz is compressed',
+        )
+        parser.add_argument(
+            '--media',
+            help='Also write referenced image files to this tar archive',
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        with open_ndjson(options['output'], 'w') as stream:
+            stats = export_recipes(stream, options['batch_size'])
+        # Данные могут идти в stdout, поэтому отчёт — в stderr.
+        self.stderr.write(format_stats(stats), style_func=None)
+        if options['media']:
+            media = export_media(options['media'])
+            self.stderr.write(
+                f'{media["files"]} files ({media["bytes"] / 2 ** 20:.1f} MiB) '
+                f'archived, {media["missing"]} missing.',
+                style_func=None,
+            )
@@ -0,0 +1,38 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.transfer import (format_stats, import_media, import_recipes,
+                              open_ndjson)
+
+
+class Command(BaseCommand):
+    help = 'Load an NDJSON file written by export_recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='NDJSON file, "-" for stdin, *.gz is compressed'
+        )
+        parser.add_argument(
+            '--media',
+            help='Tar archive with image files written by export_recipes',
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        renamed = {}
+        if options['media']:
+            renamed, media = import_media(options['media'])
+            self.stdout.write(
+                f'{media["files"]} files '
+                f'({media["bytes"] / 2 ** 20:.1f} MiB) stored.'
+            )
+        try:
+            with open_ndjson(options['path'], 'r') as stream:
+                stats = import_recipes(stream, options['batch_size'], renamed)
+        except (ValueError, ValidationError) as error:
+            raise CommandError(error)
+        self.stdout.write(format_stats(stats))
+        self.stdout.write(self.style.SUCCESS(
+            'Import finished. Run rebuild_feed, refresh_popularity --full '
+            'and rebuild_similar to update derived data.'
+        ))
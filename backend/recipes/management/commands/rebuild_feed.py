@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from recipes.feed import backfill_timeline
+from recipes.models import TimelineEntry
+from users.models import Subscriptions
+
+
+class Command(BaseCommand):
+    help = 'Rebuild subscription timelines (e.g. after bulk loading)'
+
+    def handle(self, *args, **options):
+        TimelineEntry.objects.all().delete()
+        count = 0
+        for user_id, author_id in Subscriptions.objects.values_list(
+            'user_id', 'following_id'
+        ).iterator():
+            backfill_timeline(user_id, author_id)
+            count += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'{count} subscriptions were processed.')
+        )
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.similarity import rebuild_similar
+
+
+class Command(BaseCommand):
+    help = (
+        'Update the similar recipes table for recipes changed '
+        'since the previous run'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Rebuild the table for all recipes (refreshes IDF weights)',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild_similar(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Similar recipes of {count} recipes were rebuilt '
+            f'in {time.perf_counter() - started:.2f}s.'
+        ))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.popularity import refresh_popularity
+
+
+class Command(BaseCommand):
+    help = (
+        'Add favorites and shopping cart events since the previous run '
+        'to the time-decayed recipe popularity'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recompute all scores from scratch',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = refresh_popularity(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{count} recipes were updated '
+            f'in {time.perf_counter() - started:.2f}s.'
+        ))
@@ -0,0 +1,116 @@
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.changes import record_changes_on_commit
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            RecipeTag, ShoppingCart, Tag)
+from recipes.utils import tags_mask
+from users.models import Subscriptions, User
+
+SEED_PASSWORD = 'Seed-Pa$$w0rd'
+
+
+class Command(BaseCommand):
+    help = 'Fill BD with generated users and recipes (for benchmarks)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if not tag_ids or not ingredient_ids:
+            raise CommandError('Run load_tag and load_ingredient first.')
+
+        start = User.objects.count()
+        password = make_password(SEED_PASSWORD)
+        users = User.objects.bulk_create(
+            (
+                User(
+                    email=f'seed{number}@foodgram.local',
+                    username=f'seed{number}',
+                    first_name='Seed',
+                    last_name=f'User {number}',
+                    password=password,
+                )
+                for number in range(start, start + options['users'])
+            ),
+            batch_size=batch_size,
+        )
+        user_ids = [user.id for user in users]
+
+        recipe_tags = [
+            rnd.sample(tag_ids, rnd.randint(1, 3))
+            for _ in range(options['recipes'])
+        ]
+        # bulk_create не вызывает сигналы, поэтому маска задаётся сразу.
+        recipes = Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author_id=rnd.choice(user_ids),
+                    name=f'Рецепт {number}',
+                    text='Сгенерированный рецепт.',
+                    cooking_time=rnd.randint(1, 180),
+                    tags_mask=tags_mask(recipe_tags[number]),
+                )
+                for number in range(options['recipes'])
+            ),
+            batch_size=batch_size,
+        )
+        recipe_ids = [recipe.id for recipe in recipes]
+        record_changes_on_commit(recipe_ids)
+        RecipeTag.objects.bulk_create(
+            (
+                RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id, tags in zip(recipe_ids, recipe_tags)
+                for tag_id in tags
+            ),
+            batch_size=batch_size,
+        )
+        RecipeIngredient.objects.bulk_create(
+            (
+                RecipeIngredient(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=rnd.randint(1, 500),
+                )
+                for recipe_id in recipe_ids
+                for ingredient_id in rnd.sample(
+                    ingredient_ids, rnd.randint(3, 8)
+                )
+            ),
+            batch_size=batch_size,
+        )
+        for model in (Favorite, ShoppingCart):
+            model.objects.bulk_create(
+                (
+                    model(user_id=user_id, recipe_id=recipe_id)
+                    for user_id in user_ids
+                    for recipe_id in rnd.sample(
+                        recipe_ids, min(len(recipe_ids), 5)
+                    )
+                ),
+                batch_size=batch_size,
+            )
+        Subscriptions.objects.bulk_create(
+            (
+                Subscriptions(user_id=user_id, following_id=following_id)
+                for user_id in user_ids
+                for following_id in rnd.sample(
+                    user_ids, min(len(user_ids), 5)
+                )
+                if following_id != user_id
+            ),
+            batch_size=batch_size,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(user_ids)} users and {len(recipe_ids)} recipes created '
+            f'(password: {SEED_PASSWORD}).'
+        ))
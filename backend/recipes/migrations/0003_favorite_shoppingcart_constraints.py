@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='favorite',
+            options={'default_related_name': 'favorites', 'ordering': ('user',), 'verbose_name': 'Избранное', 'verbose_name_plural': 'Избранные'},
+        ),
+        migrations.AlterModelOptions(
+            name='shoppingcart',
+            options={'default_related_name': 'shoppingcarts', 'ordering': ('user',), 'verbose_name': 'Список покупок', 'verbose_name_plural': 'Списки покупок'},
+        ),
+        migrations.AddConstraint(
+            model_name='favorite',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_favorite_pair_user_recipe'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_shoppingcart_pair_user_recipe'),
+        ),
+    ]
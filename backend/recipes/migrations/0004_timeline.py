@@ -0,0 +1,68 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_timelines(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscriptions = apps.get_model('users', 'Subscriptions')
+    TimelineEntry = apps.get_model('recipes', 'TimelineEntry')
+    for user_id, author_id in Subscriptions.objects.values_list(
+        'user_id', 'following_id'
+    ).iterator():
+        recipes = Recipe.objects.filter(author_id=author_id).order_by(
+            '-add_at', '-id'
+        ).values_list('id', 'add_at')[:settings.FEED_BACKFILL_LIMIT]
+        TimelineEntry.objects.bulk_create(
+            TimelineEntry(user_id=user_id, recipe_id=recipe_id, add_at=add_at)
+            for recipe_id, add_at in recipes
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0003_favorite_shoppingcart_constraints'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('add_at', models.DateTimeField(verbose_name='Дата добавления рецепта')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Лента подписок',
+                'ordering': ('-add_at', '-recipe'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-add_at', '-id'], name='recipe_author_add_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-add_at', '-recipe'], name='timeline_user_add_at_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_timeline_pair_user_recipe'),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:41
+
+from django.db import migrations, models
+
+import recipes.utils
+
+
+def fill_tags_mask(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeTag = apps.get_model('recipes', 'RecipeTag')
+    tag_ids = {}
+    for recipe_id, tag_id in RecipeTag.objects.values_list(
+        'recipe_id', 'tag_id'
+    ).iterator():
+        tag_ids.setdefault(recipe_id, []).append(tag_id)
+    Recipe.objects.bulk_update(
+        [
+            Recipe(id=recipe_id, tags_mask=recipes.utils.tags_mask(ids))
+            for recipe_id, ids in tag_ids.items()
+        ],
+        ['tags_mask'],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_timeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False, verbose_name='Битовая маска тегов'),
+        ),
+        migrations.RunPython(fill_tags_mask, migrations.RunPython.noop),
+    ]
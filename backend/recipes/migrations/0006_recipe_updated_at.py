@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def fill_updated_at(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.update(updated_at=models.F('add_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_tags_mask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='Дата изменения рецепта'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+    ]
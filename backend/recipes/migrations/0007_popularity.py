@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopularityCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('epoch', models.DateTimeField(verbose_name='Начало отсчёта')),
+                ('counted_until', models.DateTimeField(verbose_name='События учтены до')),
+            ],
+            options={
+                'verbose_name': 'Расчёт популярности',
+                'verbose_name_plural': 'Расчёт популярности',
+            },
+        ),
+        migrations.AddField(
+            model_name='favorite',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='popularity',
+            field=models.FloatField(default=0, editable=False, verbose_name='Популярность'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-popularity', '-id'], name='recipe_popularity_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_popularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarityCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('counted_until', models.DateTimeField(verbose_name='Изменения учтены до')),
+            ],
+            options={
+                'verbose_name': 'Расчёт похожих рецептов',
+                'verbose_name_plural': 'Расчёт похожих рецептов',
+            },
+        ),
+        migrations.CreateModel(
+            name='SimilarRecipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Близость')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar', to='recipes.recipe', verbose_name='Рецепт')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.recipe', verbose_name='Похожий рецепт')),
+            ],
+            options={
+                'verbose_name': 'Похожий рецепт',
+                'verbose_name_plural': 'Похожие рецепты',
+                'ordering': ('recipe_id', '-score', 'similar_id'),
+                'indexes': [models.Index(fields=['recipe', '-score', 'similar'], name='similar_recipe_score_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='similarrecipe',
+            constraint=models.UniqueConstraint(fields=('recipe', 'similar'), name='unique_pair_recipe_similar'),
+        ),
+    ]
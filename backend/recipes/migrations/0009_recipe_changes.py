@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:59
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def fill_recipe_changes(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeChange = apps.get_model('recipes', 'RecipeChange')
+    RecipeChange.objects.bulk_create(
+        (
+            RecipeChange(recipe_id=recipe_id, changed_at=updated_at)
+            for recipe_id, updated_at in Recipe.objects.order_by(
+                'updated_at', 'id'
+            ).values_list('id', 'updated_at').iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_similar_recipes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe_id', models.PositiveBigIntegerField(db_index=True, verbose_name='ID рецепта')),
+                ('deleted', models.BooleanField(default=False, verbose_name='Рецепт удалён')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение рецепта',
+                'verbose_name_plural': 'Журнал изменений рецептов',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.RunPython(fill_recipe_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_changes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Битовая маска тегов'),
+        ),
+    ]
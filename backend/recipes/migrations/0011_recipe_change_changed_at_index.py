@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:21
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_tags_mask_no_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipechange',
+            name='changed_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Дата изменения'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.urls import reverse
+from django.utils import timezone
 
 from recipes.constants import (MAX_LENGTH_FIELD,
                                MAX_LENGTH_INGREDIENT_MEASUREMENT_UNIT,
@@ -109,6 +110,22 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата добавления рецепта',
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения рецепта',
+        auto_now=True,
+        db_index=True,
+    )
+    # Без индекса: условие по маске — побитовое И, B-tree его не использует.
+    tags_mask = models.BigIntegerField(
+        'Битовая маска тегов',
+        default=0,
+        editable=False,
+    )
+    popularity = models.FloatField(
+        'Популярность',
+        default=0,
+        editable=False,
+    )
     short_link = models.CharField(
         verbose_name='Короткая ссылка на рецепт',
         default=generate_short_link,
@@ -125,6 +142,16 @@ class Recipe(models.Model):
                 name='unique_pair_author_name',
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('author', '-add_at', '-id'),
+                name='recipe_author_add_at_idx',
+            ),
+            models.Index(
+                fields=('-popularity', '-id'),
+                name='recipe_popularity_idx',
+            ),
+        )
 
     def __str__(self):
         return f'Рецепт {self.name} от {self.author}'
@@ -196,6 +223,46 @@ class RecipeTag(models.Model):
         )
 
 
+class TimelineEntry(models.Model):
+    """Рецепт в ленте подписок пользователя (fan-out при публикации)."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='timeline',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='timeline_entries',
+    )
+    add_at = models.DateTimeField(
+        verbose_name='Дата добавления рецепта',
+    )
+
+    class Meta:
+        ordering = ('-add_at', '-recipe')
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_timeline_pair_user_recipe',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-add_at', '-recipe'),
+                name='timeline_user_add_at_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'Рецепт {self.recipe} в ленте {self.user}'
+
+
 class BaseUserRecipe(models.Model):
     """Абстрактная модель для избранного и списка покупок."""
 
@@ -209,6 +276,11 @@ class BaseUserRecipe(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Рецепт'
     )
+    created_at = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+        db_index=True,
+    )
 
     class Meta:
         abstract = True
@@ -247,3 +319,96 @@ class ShoppingCart(BaseUserRecipe):
         default_related_name = 'shoppingcarts'
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
+
+
+class PopularityCheckpoint(models.Model):
+    """Состояние расчёта популярности (единственная запись).
+
+    Recipe.popularity — сумма вкладов событий weight * exp(λ(t - epoch)),
+    учтённых до counted_until включительно.
+    """
+
+    epoch = models.DateTimeField('Начало отсчёта')
+    counted_until = models.DateTimeField('События учтены до')
+
+    class Meta:
+        verbose_name = 'Расчёт популярности'
+        verbose_name_plural = 'Расчёт популярности'
+
+    def __str__(self):
+        return f'Популярность учтена до {self.counted_until}'
+
+
+class SimilarRecipe(models.Model):
+    """Похожий рецепт (top-k по TF-IDF косинусной близости ингредиентов)."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='similar',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Похожий рецепт',
+        related_name='+',
+    )
+    score = models.FloatField('Близость')
+
+    class Meta:
+        ordering = ('recipe_id', '-score', 'similar_id')
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_pair_recipe_similar',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('recipe', '-score', 'similar'),
+                name='similar_recipe_score_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe} похож на {self.similar}'
+
+
+class SimilarityCheckpoint(models.Model):
+    """Время, до которого изменения рецептов учтены в SimilarRecipe."""
+
+    counted_until = models.DateTimeField('Изменения учтены до')
+
+    class Meta:
+        verbose_name = 'Расчёт похожих рецептов'
+        verbose_name_plural = 'Расчёт похожих рецептов'
+
+    def __str__(self):
+        return f'Похожие рецепты учтены до {self.counted_until}'
+
+
+class RecipeChange(models.Model):
+    """Последнее изменение рецепта для синхронизации клиентов.
+
+    id растёт с каждым изменением и служит курсором. На рецепт остаётся
+    одна строка: новая запись заменяет старые. Удалённый рецепт остаётся
+    в журнале строкой deleted.
+    """
+
+    recipe_id = models.PositiveBigIntegerField('ID рецепта', db_index=True)
+    deleted = models.BooleanField('Рецепт удалён', default=False)
+    changed_at = models.DateTimeField(
+        'Дата изменения', default=timezone.now, db_index=True
+    )
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = 'Изменение рецепта'
+        verbose_name_plural = 'Журнал изменений рецептов'
+
+    def __str__(self):
+        action = 'удалён' if self.deleted else 'изменён'
+        return f'Рецепт {self.recipe_id} {action} ({self.changed_at})'
@@ -0,0 +1,309 @@
+"""Поиск рецептов по имеющимся продуктам («готовлю из того, что есть»).
+
+Индекс живёт в памяти процесса. Для каждого ингредиента хранится множество
+рецептов с ним: битовое (int, номер бита — id рецепта) или, для редких
+ингредиентов, отсортированный массив id — так индекс занимает не больше
+4 байт на связь рецепт-ингредиент. Сколько имеющихся ингредиентов входит
+в каждый рецепт, считает побитовый сумматор (bit-sliced counter) сразу
+для всех рецептов.
+
+Индекс строится при прогреве (foodgram_backend.warmup), без него — при
+первом поиске. Изменения, сделанные в процессе, применяются по сигналу
+recipes_changed, сделанные другими процессами (и удаления) — по журналу
+RecipeChange не реже раза в PANTRY_INDEX_SYNC_SECONDS. Раз
+в PANTRY_INDEX_TTL индекс строится заново в фоновом потоке, а поиск пока
+идёт по прежнему.
+"""
+import threading
+import time
+from datetime import timedelta
+from fractions import Fraction
+
+import numpy as np
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from recipes.models import Recipe, RecipeChange, RecipeIngredient
+
+# Изменения, попавшие на границу прошлой синхронизации, читаются повторно.
+SYNC_OVERLAP = timedelta(minutes=1)
+# Массив id занимает 32 бита на рецепт, битовое множество — 1 бит на id.
+DENSE_RATIO = 32
+
+
+def to_bitset(positions):
+    if not len(positions):
+        return 0
+    flags = np.zeros(int(positions[-1]) + 1, dtype=bool)
+    flags[positions] = True
+    return int.from_bytes(
+        np.packbits(flags, bitorder='little').tobytes(), 'little'
+    )
+
+
+def bit_positions(bits):
+    data = np.frombuffer(
+        bits.to_bytes((bits.bit_length() + 7) // 8, 'little'), np.uint8
+    )
+    return np.flatnonzero(np.unpackbits(data, bitorder='little'))
+
+
+class PantryResult:
+    """Найденные id рецептов: по убыванию доли имеющихся ингредиентов,
+    затем по времени приготовления.
+
+    Поддерживает len() и срезы, поэтому подходит для пагинаторов.
+    """
+
+    def __init__(self, groups, cooking_time):
+        self.groups = groups
+        self.sizes = [group.bit_count() for group in groups]
+        self.cooking_time = cooking_time
+
+    def __len__(self):
+        return sum(self.sizes)
+
+    def __getitem__(self, item):
+        start, stop, _ = item.indices(len(self))
+        ids = []
+        for group, size in zip(self.groups, self.sizes):
+            if start >= stop:
+                break
+            if start >= size:
+                start -= size
+                stop -= size
+                continue
+            positions = bit_positions(group)
+            order = np.lexsort((positions, self.cooking_time[positions]))
+            ids.extend(positions[order][start:stop].tolist())
+            stop -= size
+            start = 0
+        return ids
+
+
+class PantryIndex:
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        # Индекс строит один поток за раз.
+        self.build_lock = threading.Lock()
+        # Изменения других процессов догоняет один поток за раз.
+        self.sync_lock = threading.Lock()
+        self.built_at = None
+
+    def build(self):
+        started = timezone.now()
+        recipes = np.array(
+            list(Recipe.objects.order_by().values_list(
+                'id', 'cooking_time'
+            ).iterator(chunk_size=settings.PANTRY_INDEX_BATCH_SIZE)),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        pairs = np.array(
+            list(RecipeIngredient.objects.order_by(
+                'recipe_id', 'ingredient_id'
+            ).values_list('recipe_id', 'ingredient_id').iterator(
+                chunk_size=settings.PANTRY_INDEX_BATCH_SIZE
+            )),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        capacity = int(recipes[:, 0].max(initial=0)) + 1
+        cooking_time = np.zeros(capacity, dtype=np.int32)
+        cooking_time[recipes[:, 0]] = recipes[:, 1]
+
+        recipe_ids, counts = np.unique(pairs[:, 0], return_counts=True)
+        sizes = np.zeros(capacity, dtype=np.int64)
+        sizes[recipe_ids] = counts
+        postings = {}
+        by_ingredient = np.argsort(pairs[:, 1], kind='stable')
+        ingredient_ids, starts = np.unique(
+            pairs[by_ingredient, 1], return_index=True
+        )
+        for ingredient_id, positions in zip(
+            ingredient_ids.tolist(),
+            np.split(pairs[by_ingredient, 0].astype(np.uint32), starts[1:])
+        ):
+            postings[ingredient_id] = (
+                to_bitset(positions)
+                if len(positions) * DENSE_RATIO >= capacity else positions
+            )
+
+        with self.lock:
+            self.cooking_time = cooking_time
+            self.postings = postings
+            self.size_eq = {
+                size: to_bitset(np.flatnonzero(sizes == size))
+                for size in np.unique(counts).tolist()
+            }
+            # Состав рецептов на момент построения и изменённые после него.
+            self.base_ids = recipe_ids
+            self.base_offsets = np.concatenate(([0], np.cumsum(counts)))
+            self.base_items = pairs[:, 1]
+            self.changed = {}
+            self.built_at = time.monotonic()
+            self.synced_at = self.built_at
+            self.synced_until = started
+
+    def rebuild(self):
+        """Строит индекс заново в фоновом потоке (build_lock уже взят)."""
+        try:
+            self.build()
+        finally:
+            self.build_lock.release()
+            # Соединения этого потока.
+            connections.close_all()
+
+    def recipe_ingredients(self, recipe_id):
+        if recipe_id in self.changed:
+            return self.changed[recipe_id]
+        index = np.searchsorted(self.base_ids, recipe_id)
+        if index == len(self.base_ids) or self.base_ids[index] != recipe_id:
+            return ()
+        return tuple(self.base_items[
+            self.base_offsets[index]:self.base_offsets[index + 1]
+        ].tolist())
+
+    def set_posting(self, ingredient_id, recipe_id, present):
+        posting = self.postings.get(ingredient_id, np.array([], np.uint32))
+        if isinstance(posting, int):
+            bit = 1 << recipe_id
+            posting = posting | bit if present else posting & ~bit
+        else:
+            index = np.searchsorted(posting, recipe_id)
+            found = index < len(posting) and posting[index] == recipe_id
+            if present and not found:
+                posting = np.insert(posting, index, recipe_id)
+            elif found and not present:
+                posting = np.delete(posting, index)
+        self.postings[ingredient_id] = posting
+
+    def replace(self, recipe_id, cooking_time, ingredient_ids):
+        """Заменяет рецепт в индексе; cooking_time=None — рецепт удалён."""
+        old = set(self.recipe_ingredients(recipe_id))
+        new = set(ingredient_ids) if cooking_time is not None else set()
+        for ingredient_id in old - new:
+            self.set_posting(ingredient_id, recipe_id, False)
+        for ingredient_id in new - old:
+            self.set_posting(ingredient_id, recipe_id, True)
+        bit = 1 << recipe_id
+        if old:
+            self.size_eq[len(old)] &= ~bit
+        if new:
+            self.size_eq[len(new)] = self.size_eq.get(len(new), 0) | bit
+        if cooking_time is not None:
+            if recipe_id >= len(self.cooking_time):
+                self.cooking_time = np.resize(
+                    self.cooking_time, 2 * recipe_id + 1
+                )
+            self.cooking_time[recipe_id] = cooking_time
+        self.changed[recipe_id] = tuple(new)
+
+    def refresh(self, recipe_ids):
+        """Перечитывает рецепты recipe_ids из БД."""
+        recipe_ids = list(recipe_ids)
+        recipes = dict(Recipe.objects.filter(id__in=recipe_ids).values_list(
+            'id', 'cooking_time'
+        ))
+        ingredients = {recipe_id: [] for recipe_id in recipe_ids}
+        for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'ingredient_id'):
+            ingredients[recipe_id].append(ingredient_id)
+        with self.lock:
+            for recipe_id in recipe_ids:
+                self.replace(
+                    recipe_id, recipes.get(recipe_id), ingredients[recipe_id]
+                )
+
+    def sync(self):
+        """Строит индекс или догоняет изменения других процессов."""
+        if self.built_at is None:
+            with self.build_lock:
+                if self.built_at is None:
+                    self.build()
+            return
+        now = time.monotonic()
+        if (
+            now - self.built_at > settings.PANTRY_INDEX_TTL
+            and self.build_lock.acquire(blocking=False)
+        ):
+            threading.Thread(target=self.rebuild, daemon=True).start()
+        if (
+            now - self.synced_at < settings.PANTRY_INDEX_SYNC_SECONDS
+            or not self.sync_lock.acquire(blocking=False)
+        ):
+            return
+        # Запросы к БД — без self.lock: поиск их не ждёт.
+        try:
+            built_at, started = self.built_at, timezone.now()
+            # Удалённые рецепты refresh уже не найдёт и уберёт из индекса.
+            self.refresh(set(RecipeChange.objects.filter(
+                changed_at__gt=self.synced_until - SYNC_OVERLAP
+            ).values_list('recipe_id', flat=True)))
+            with self.lock:
+                # Индекс, построенный тем временем, догоняет от своего начала.
+                if self.built_at == built_at:
+                    self.synced_at = now
+                    self.synced_until = started
+        finally:
+            self.sync_lock.release()
+
+    def search(self, have, missing_max):
+        """Рецепты, где есть хотя бы один из have и не хватает
+        не больше missing_max ингредиентов."""
+        self.sync()
+        with self.lock:
+            matched, slices = 0, []
+            postings = [
+                self.postings[ingredient_id] for ingredient_id in set(have)
+                if ingredient_id in self.postings
+            ]
+            for posting in postings:
+                carry = (
+                    posting if isinstance(posting, int) else to_bitset(posting)
+                )
+                matched |= carry
+                for index, bits in enumerate(slices):
+                    slices[index] = bits ^ carry
+                    carry &= bits
+                    if not carry:
+                        break
+                else:
+                    if carry:
+                        slices.append(carry)
+
+            def count_equals(count):
+                bits = matched
+                for index, count_bits in enumerate(slices):
+                    if count >> index & 1:
+                        bits &= count_bits
+                    else:
+                        bits &= ~count_bits
+                return bits if count < 1 << len(slices) else 0
+
+            groups = {}
+            for size, recipes in self.size_eq.items():
+                for count in range(
+                    max(1, size - missing_max), min(size, len(postings)) + 1
+                ):
+                    found = recipes & count_equals(count)
+                    if found:
+                        share = Fraction(count, size)
+                        groups[share] = groups.get(share, 0) | found
+            return PantryResult(
+                [groups[share] for share in sorted(groups, reverse=True)],
+                self.cooking_time
+            )
+
+    def invalidate(self, recipe_ids):
+        """Применяет изменения рецептов, сделанные в этом процессе.
+
+        recipe_ids=None (изменён тег или ингредиент) состав рецептов
+        не меняет: удаление ингредиента приходит и по его рецептам.
+        """
+        if self.built_at is not None and recipe_ids is not None:
+            self.refresh(recipe_ids)
+
+
+pantry_index = PantryIndex()
@@ -0,0 +1,210 @@
+"""Популярность рецептов с экспоненциальным затуханием (forward decay).
+
+Событие (добавление в избранное или корзину) в момент t добавляет
+к Recipe.popularity weight * exp(λ(t - epoch)), λ = ln 2 / период
+полураспада. Относительный порядок таких сумм совпадает с порядком
+«затухших к текущему моменту» оценок, поэтому новые события просто
+прибавляются, а старые оценки не пересчитываются. Когда вклады становятся
+слишком большими, epoch сдвигается, а все оценки умножаются на один
+множитель.
+"""
+import heapq
+import math
+from datetime import timedelta
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from recipes.models import Favorite, PopularityCheckpoint, Recipe, ShoppingCart
+
+EVENT_WEIGHTS = {Favorite: 2.0, ShoppingCart: 1.0}
+POPULARITY_ORDERING = ('-popularity', '-id')
+# Сдвиг epoch, когда вклад нового события превышает 2 ** REBASE_HALF_LIVES.
+REBASE_HALF_LIVES = 64
+
+
+def decay_rate():
+    return math.log(2) / timedelta(
+        days=settings.POPULARITY_HALF_LIFE_DAYS
+    ).total_seconds()
+
+
+def contribution(weight, created_at, epoch):
+    return weight * math.exp(
+        decay_rate() * (created_at - epoch).total_seconds()
+    )
+
+
+def get_checkpoint():
+    checkpoint = PopularityCheckpoint.objects.select_for_update().first()
+    if checkpoint is None:
+        now = timezone.now()
+        checkpoint = PopularityCheckpoint.objects.create(
+            epoch=now, counted_until=now - timedelta(days=365 * 100)
+        )
+    return checkpoint
+
+
+def collect_scores(since, until, epoch):
+    """Сумма вкладов событий из интервала (since, until] по рецептам."""
+    scores = {}
+    for model, weight in EVENT_WEIGHTS.items():
+        events = model.objects.filter(created_at__lte=until)
+        if since is not None:
+            events = events.filter(created_at__gt=since)
+        for recipe_id, created_at in events.values_list(
+            'recipe_id', 'created_at'
+        ).order_by().iterator(chunk_size=settings.POPULARITY_BATCH_SIZE):
+            scores[recipe_id] = scores.get(recipe_id, 0) + contribution(
+                weight, created_at, epoch
+            )
+    return scores
+
+
+def model_events(model, weight, since, until):
+    """События модели (since, until] по времени: (время, рецепт, вес)."""
+    for recipe_id, created_at in model.objects.filter(
+        created_at__gt=since, created_at__lte=until
+    ).values_list('recipe_id', 'created_at').order_by('created_at').iterator(
+        chunk_size=settings.POPULARITY_BATCH_SIZE
+    ):
+        yield created_at, recipe_id, weight
+
+
+def event_batches(since, until):
+    """События (since, until] по времени, пачками по POPULARITY_BATCH_SIZE.
+
+    Возвращает пары (время последнего события, события). События с одним
+    временем не разделяются: время пачки становится курсором. Потоки
+    моделей сливаются по времени, в памяти — одна пачка.
+    """
+    batch = []
+    for event in heapq.merge(
+        *(
+            model_events(model, weight, since, until)
+            for model, weight in EVENT_WEIGHTS.items()
+        ),
+        key=itemgetter(0),
+    ):
+        if (
+            len(batch) >= settings.POPULARITY_BATCH_SIZE
+            and event[0] != batch[-1][0]
+        ):
+            yield batch[-1][0], batch
+            batch = []
+        batch.append(event)
+    if batch:
+        yield batch[-1][0], batch
+
+
+def advance(checkpoint, counted_until):
+    """Сдвигает курсор, если его не сдвинул параллельный запуск."""
+    advanced = PopularityCheckpoint.objects.filter(
+        pk=checkpoint.pk,
+        epoch=checkpoint.epoch,
+        counted_until=checkpoint.counted_until,
+    ).update(counted_until=counted_until)
+    if not advanced:
+        raise RuntimeError('Популярность пересчитывает другой запуск.')
+    checkpoint.counted_until = counted_until
+
+
+def apply_events(checkpoint, until):
+    """Прибавляет вклады событий пачками; пачка и сдвиг курсора — одна
+    короткая транзакция, поэтому событие учитывается ровно один раз."""
+    recipe_ids = set()
+    for batch_until, events in event_batches(checkpoint.counted_until, until):
+        scores = {}
+        for created_at, recipe_id, weight in events:
+            scores[recipe_id] = scores.get(recipe_id, 0) + contribution(
+                weight, created_at, checkpoint.epoch
+            )
+        with transaction.atomic():
+            advance(checkpoint, batch_until)
+            Recipe.objects.bulk_update(
+                [
+                    Recipe(id=recipe_id, popularity=F('popularity') + score)
+                    for recipe_id, score in scores.items()
+                ],
+                ['popularity'],
+            )
+        recipe_ids.update(scores)
+    advance(checkpoint, until)
+    return len(recipe_ids)
+
+
+def apply_full(scores):
+    """Записывает оценки всех рецептов пачками по диапазонам id."""
+    last_id = 0
+    while rows := list(Recipe.objects.filter(id__gt=last_id).order_by(
+        'id'
+    ).values_list('id', 'popularity')[:settings.POPULARITY_BATCH_SIZE]):
+        last_id = rows[-1][0]
+        with transaction.atomic():
+            Recipe.objects.bulk_update(
+                [
+                    Recipe(id=recipe_id, popularity=scores.get(recipe_id, 0))
+                    for recipe_id, popularity in rows
+                    if popularity != scores.get(recipe_id, 0)
+                ],
+                ['popularity'],
+            )
+
+
+def rebase(checkpoint, now):
+    """Сдвигает epoch к now, сохраняя порядок рецептов."""
+    Recipe.objects.exclude(popularity=0).update(
+        popularity=F('popularity') * contribution(1, checkpoint.epoch, now)
+    )
+    checkpoint.epoch = now
+
+
+def refresh_popularity(full=False):
+    """Учитывает события, появившиеся после прошлого запуска.
+
+    События последних POPULARITY_LAG_SECONDS секунд откладываются
+    до следующего запуска: их транзакции могут быть ещё не завершены.
+    События читаются вне транзакций, а оценки пишутся короткими
+    транзакциями по POPULARITY_BATCH_SIZE. full пересчитывает оценки
+    в текущей epoch, поэтому до конца пересчёта порядок рецептов
+    остаётся осмысленным. Возвращает число рецептов с изменившейся
+    оценкой.
+    """
+    now = timezone.now()
+    until = now - timedelta(seconds=settings.POPULARITY_LAG_SECONDS)
+    with transaction.atomic():
+        checkpoint = get_checkpoint()
+        if (now - checkpoint.epoch).total_seconds() * decay_rate() > (
+            REBASE_HALF_LIVES * math.log(2)
+        ):
+            rebase(checkpoint, now)
+            checkpoint.save()
+    if not full:
+        return apply_events(checkpoint, until)
+    scores = collect_scores(None, until, checkpoint.epoch)
+    apply_full(scores)
+    with transaction.atomic():
+        advance(checkpoint, until)
+    return len(scores)
+
+
+def retract_event(instance):
+    """Вычитает вклад удалённого события, если он уже был учтён."""
+    checkpoint = PopularityCheckpoint.objects.first()
+    if checkpoint is None or instance.created_at > checkpoint.counted_until:
+        return
+    Recipe.objects.filter(id=instance.recipe_id).update(
+        # Погрешность вычитания не должна опускать оценку ниже нуля.
+        popularity=Greatest(
+            F('popularity') - contribution(
+                EVENT_WEIGHTS[type(instance)],
+                instance.created_at,
+                checkpoint.epoch
+            ),
+            Value(0.0)
+        )
+    )
@@ -0,0 +1,232 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from jobs.queue import enqueue
+from recipes.changes import record_changes_on_commit
+from recipes.feed import prune_timeline
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            RecipeTag, ShoppingCart, Tag)
+from recipes.pantry import pantry_index
+from recipes.popularity import retract_event
+from recipes.tasks import (backfill_timeline_task, fan_out_recipe_task,
+                           fan_out_recipes_task)
+from recipes.utils import tags_mask
+from users.models import Subscriptions, User
+
+# Изменилось содержимое рецептов recipe_ids (None — возможно, любых).
+recipes_changed = Signal()
+# Рецепты, изменённые в текущем блоке recipe_writes().
+current_writes = ContextVar('current_writes', default=None)
+
+
+def update_tags_mask(recipe_ids):
+    recipe_tags = {recipe_id: [] for recipe_id in recipe_ids}
+    for recipe_id, tag_id in RecipeTag.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'tag_id'):
+        recipe_tags[recipe_id].append(tag_id)
+    masks = {
+        recipe_id: tags_mask(tag_ids)
+        for recipe_id, tag_ids in recipe_tags.items()
+    }
+    # Различных масок мало: по запросу на маску, а не CASE на рецепт.
+    recipe_ids_by_mask = defaultdict(list)
+    for recipe_id, mask in masks.items():
+        recipe_ids_by_mask[mask].append(recipe_id)
+    for mask, recipe_ids in recipe_ids_by_mask.items():
+        Recipe.objects.filter(id__in=recipe_ids).update(tags_mask=mask)
+    return masks
+
+
+def touch_recipes(**lookup):
+    """Обновляет updated_at рецептов, которые не сохраняются сами."""
+    recipes = Recipe.objects.filter(**lookup)
+    record_changes_on_commit(recipes.values_list('id', flat=True))
+    recipes.update(updated_at=timezone.now())
+
+
+def recipes_modified(recipe_ids):
+    writes = current_writes.get()
+    if writes is not None:
+        writes.modified.update(recipe_ids)
+        return
+    touch_recipes(id__in=recipe_ids)
+    recipes_changed.send(sender=Recipe, recipe_ids=recipe_ids)
+
+
+class RecipeWrites:
+    """Рецепты, изменённые в блоке recipe_writes()."""
+
+    def __init__(self):
+        self.modified = set()
+        # Сохранённые целиком: их updated_at уже обновлён.
+        self.saved = set()
+        self.deleted = set()
+
+    def apply(self):
+        touched = self.modified - self.saved - self.deleted
+        if touched:
+            Recipe.objects.filter(id__in=touched).update(
+                updated_at=timezone.now()
+            )
+        # Одна запись журнала на рецепт, после коммита.
+        record_changes_on_commit(
+            (self.modified | self.saved) - self.deleted
+        )
+        record_changes_on_commit(self.deleted, deleted=True)
+        if self.modified:
+            recipes_changed.send(
+                sender=Recipe, recipe_ids=list(self.modified)
+            )
+
+
+@contextmanager
+def recipe_writes():
+    """Транзакция, в которой каждый рецепт обновляется один раз, в конце.
+
+    Изменения ингредиентов и тегов рецепта внутри блока только
+    запоминаются: updated_at и recipes_changed — по разу на рецепт.
+    """
+    if current_writes.get() is not None:
+        yield
+        return
+    writes = RecipeWrites()
+    token = current_writes.set(writes)
+    try:
+        with transaction.atomic():
+            yield
+            writes.apply()
+    finally:
+        current_writes.reset(token)
+
+
+@receiver(recipes_changed)
+def pantry_recipes_changed(sender, recipe_ids, **kwargs):
+    transaction.on_commit(partial(pantry_index.invalidate, recipe_ids))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    if created:
+        enqueue(
+            fan_out_recipe_task,
+            {'recipe_id': instance.pk},
+            dedup_key=f'fan-out:{instance.pk}',
+        )
+    writes = current_writes.get()
+    if writes is not None:
+        writes.saved.add(instance.pk)
+    else:
+        record_changes_on_commit([instance.pk])
+    recipes_changed.send(sender=Recipe, recipe_ids=[instance.pk])
+
+
+def recipes_created(recipes):
+    """Для рецептов из bulk_create: то же, что recipe_saved при создании."""
+    recipe_ids = [recipe.pk for recipe in recipes]
+    if recipe_ids:
+        enqueue(fan_out_recipes_task, {'recipe_ids': recipe_ids})
+        record_changes_on_commit(recipe_ids)
+        recipes_changed.send(sender=Recipe, recipe_ids=recipe_ids)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    writes = current_writes.get()
+    if writes is not None:
+        writes.deleted.add(instance.pk)
+    else:
+        record_changes_on_commit([instance.pk], deleted=True)
+    recipes_changed.send(sender=Recipe, recipe_ids=[instance.pk])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    recipes_modified([instance.recipe_id])
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, **kwargs):
+    touch_recipes(tags=instance)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, **kwargs):
+    touch_recipes(ingredients=instance)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def catalogue_changed(sender, **kwargs):
+    # Тег или ингредиент может входить в любое число рецептов.
+    # При удалении связи удаляются каскадом и обновляют рецепты сами.
+    recipes_changed.send(sender=sender, recipe_ids=None)
+
+
+@receiver(post_save, sender=User)
+def author_saved(sender, instance, created, update_fields, **kwargs):
+    if created or update_fields == frozenset(('last_login',)):
+        return
+    recipes_modified(list(
+        Recipe.objects.filter(author=instance).values_list('id', flat=True)
+    ))
+
+
+@receiver(post_save, sender=Subscriptions)
+def subscription_saved(sender, instance, created, **kwargs):
+    if created:
+        enqueue(
+            backfill_timeline_task,
+            {'user_id': instance.user_id, 'author_id': instance.following_id},
+            dedup_key=f'backfill:{instance.user_id}:{instance.following_id}',
+        )
+
+
+@receiver(post_delete, sender=Subscriptions)
+def subscription_deleted(sender, instance, **kwargs):
+    prune_timeline(instance.user_id, instance.following_id)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def user_recipe_deleted(sender, instance, origin=None, **kwargs):
+    # Вместе с рецептом удаляется и его оценка.
+    if not isinstance(origin, Recipe):
+        retract_event(instance)
+
+
+@receiver(m2m_changed, sender=RecipeTag)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            # Иначе последующий instance.save() затрёт маску старым значением.
+            instance.tags_mask = update_tags_mask([instance.pk])[instance.pk]
+            recipes_modified([instance.pk])
+    elif action == 'pre_clear':
+        # tag.recipes.clear(): после очистки связи уже не найти.
+        instance.cleared_recipe_ids = list(RecipeTag.objects.filter(
+            tag=instance
+        ).values_list('recipe_id', flat=True))
+    elif action == 'post_clear':
+        update_tags_mask(instance.cleared_recipe_ids)
+        recipes_modified(instance.cleared_recipe_ids)
+    elif action in ('post_add', 'post_remove'):
+        update_tags_mask(pk_set)
+        recipes_modified(list(pk_set))
+
+
+@receiver(post_save, sender=RecipeTag)
+@receiver(post_delete, sender=RecipeTag)
+def recipe_tag_changed(sender, instance, **kwargs):
+    update_tags_mask([instance.recipe_id])
+    recipes_modified([instance.recipe_id])
@@ -0,0 +1,182 @@
+"""Похожие рецепты: TF-IDF косинусная близость наборов ингредиентов.
+
+Рецепты — строки разреженной матрицы рецепт × ингредиент с весами IDF,
+нормированные по L2, поэтому близость — скалярное произведение строк.
+Произведение считается блоками по SIMILAR_RECIPES_BLOCK_CELLS ячеек,
+от каждой строки в SimilarRecipe остаются SIMILAR_RECIPES_COUNT лучших.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+from scipy import sparse
+
+from recipes.models import (Recipe, RecipeIngredient, SimilarityCheckpoint,
+                            SimilarRecipe)
+
+# Изменения, попавшие на границу прошлого запуска, учитываются повторно.
+CHECKPOINT_OVERLAP = timedelta(minutes=1)
+
+
+def tfidf_matrix():
+    """Матрица рецепт × ингредиент и id рецептов её строк."""
+    pairs = np.array(
+        list(RecipeIngredient.objects.order_by().values_list(
+            'recipe_id', 'ingredient_id'
+        ).iterator(chunk_size=settings.SIMILAR_RECIPES_BATCH_SIZE)),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    recipe_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+    ingredient_ids, columns = np.unique(pairs[:, 1], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(pairs)), (rows, columns)),
+        shape=(len(recipe_ids), len(ingredient_ids)),
+    )
+    document_frequency = np.bincount(columns, minlength=len(ingredient_ids))
+    idf = np.log((1 + len(recipe_ids)) / (1 + document_frequency)) + 1
+    matrix = sparse.csr_matrix(matrix.multiply(idf))
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1))).ravel()
+    return sparse.diags(1 / norms) @ matrix, recipe_ids
+
+
+def blocks(matrix, rows):
+    """Части rows, произведение которых на матрицу не больше бюджета."""
+    size = max(1, settings.SIMILAR_RECIPES_BLOCK_CELLS // matrix.shape[0])
+    for start in range(0, len(rows), size):
+        block = rows[start:start + size]
+        yield block, sparse.csr_matrix(matrix[block] @ matrix.T)
+
+
+def top_similar(matrix, rows, count):
+    """(строка, строки похожих, близости) для rows, лучшие первыми."""
+    for block, product in blocks(matrix, rows):
+        for index, row in enumerate(block):
+            start, end = product.indptr[index], product.indptr[index + 1]
+            columns = product.indices[start:end]
+            scores = product.data[start:end]
+            other = columns != row
+            columns, scores = columns[other], scores[other]
+            if len(scores) > count:
+                # Равные k-й близости остаются, чтобы выбор не зависел
+                # от порядка в матрице: при равенстве выигрывает меньший id.
+                threshold = np.partition(
+                    scores, len(scores) - count
+                )[len(scores) - count]
+                best = scores >= threshold
+                columns, scores = columns[best], scores[best]
+            order = np.lexsort((columns, -scores))[:count]
+            yield row, columns[order], scores[order]
+
+
+def affected_rows(matrix, recipe_ids, changed_rows):
+    """Строки, чей top-k мог измениться после правки changed_rows."""
+    count = settings.SIMILAR_RECIPES_COUNT
+    affected = set(changed_rows.tolist())
+    neighbours = np.array(list(SimilarRecipe.objects.filter(
+        similar_id__in=recipe_ids[changed_rows].tolist()
+    ).values_list('recipe_id', flat=True).distinct()), dtype=np.int64)
+    affected.update(np.searchsorted(
+        recipe_ids, neighbours[np.isin(neighbours, recipe_ids)]
+    ).tolist())
+    # Лучшая новая близость каждого рецепта-кандидата.
+    candidates = {}
+    for block, product in blocks(matrix, changed_rows):
+        product = product.tocoo()
+        for row, score in zip(product.col.tolist(), product.data.tolist()):
+            if row not in affected and score > candidates.get(row, -1):
+                candidates[row] = score
+    # Сколько похожих у кандидатов и близость самого далёкого из них.
+    rows = sorted(candidates)
+    batch_size = settings.SIMILAR_RECIPES_BATCH_SIZE
+    weakest = {}
+    for start in range(0, len(rows), batch_size):
+        similar = SimilarRecipe.objects.filter(
+            recipe_id__in=recipe_ids[rows[start:start + batch_size]].tolist()
+        ).values('recipe_id').annotate(
+            similar_count=Count('id'), min_score=Min('score')
+        ).order_by()
+        for recipe_id, similar_count, min_score in similar.values_list(
+            'recipe_id', 'similar_count', 'min_score'
+        ):
+            weakest[recipe_id] = (similar_count, min_score)
+    for row, score in candidates.items():
+        similar_count, min_score = weakest.get(int(recipe_ids[row]), (0, 0))
+        if similar_count < count or score > min_score:
+            affected.add(row)
+    return np.array(sorted(affected), dtype=np.int64)
+
+
+def save_similar(matrix, recipe_ids, rows, full=False):
+    """Пишет top-k для rows короткими транзакциями по пачкам рецептов.
+
+    Матрица считается вне транзакций; каждая пачка заменяет строки своих
+    рецептов. При full заменяются строки всего диапазона id пачки, так
+    что исчезают и рецепты, которых больше нет в матрице.
+    """
+    batch_size = settings.SIMILAR_RECIPES_BATCH_SIZE
+    previous_id = None
+    for start in range(0, len(rows), batch_size):
+        block = rows[start:start + batch_size]
+        block_ids = recipe_ids[block].tolist()
+        similar = [
+            SimilarRecipe(
+                recipe_id=int(recipe_ids[row]),
+                similar_id=int(recipe_ids[column]),
+                score=float(score),
+            )
+            for row, columns, scores in top_similar(
+                matrix, block, settings.SIMILAR_RECIPES_COUNT
+            )
+            for column, score in zip(columns, scores)
+        ]
+        if full:
+            # rows при full — все строки матрицы по возрастанию id.
+            stale = SimilarRecipe.objects.filter(recipe_id__lte=block_ids[-1])
+            if previous_id is not None:
+                stale = stale.filter(recipe_id__gt=previous_id)
+        else:
+            stale = SimilarRecipe.objects.filter(recipe_id__in=block_ids)
+        with transaction.atomic():
+            stale.delete()
+            SimilarRecipe.objects.bulk_create(similar, batch_size=batch_size)
+        previous_id = block_ids[-1]
+    if full:
+        stale = SimilarRecipe.objects.all()
+        if previous_id is not None:
+            stale = stale.filter(recipe_id__gt=previous_id)
+        stale.delete()
+
+
+def rebuild_similar(full=False):
+    """Пересчитывает похожие рецепты, изменённые после прошлого запуска.
+
+    Кроме изменённых рецептов пересчитываются те, в чьём top-k они были
+    или могут появиться. IDF при этом не обновляется во всей таблице,
+    а удалённые рецепты просто исчезают из списков: полностью всё
+    пересчитывает full=True. Запуски не должны пересекаться (cron).
+    Возвращает число пересчитанных рецептов.
+    """
+    started = timezone.now()
+    checkpoint = SimilarityCheckpoint.objects.first()
+    if checkpoint is None:
+        checkpoint = SimilarityCheckpoint(counted_until=started)
+        full = True
+    matrix, recipe_ids = tfidf_matrix()
+    if full or not len(recipe_ids):
+        full = True
+        rows = np.arange(len(recipe_ids))
+    else:
+        changed = np.array(list(Recipe.objects.filter(
+            updated_at__gt=checkpoint.counted_until - CHECKPOINT_OVERLAP
+        ).values_list('id', flat=True)), dtype=np.int64)
+        changed = changed[np.isin(changed, recipe_ids)]
+        rows = affected_rows(
+            matrix, recipe_ids, np.searchsorted(recipe_ids, changed)
+        )
+    save_similar(matrix, recipe_ids, rows, full)
+    checkpoint.counted_until = started
+    checkpoint.save()
+    return len(rows)
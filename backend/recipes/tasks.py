@@ -0,0 +1,26 @@
+from jobs.queue import task
+from recipes.feed import backfill_timeline, fan_out_recipe
+from recipes.models import Recipe
+from users.models import Subscriptions
+
+
+@task
+def fan_out_recipe_task(recipe_id):
+    recipe = Recipe.objects.filter(id=recipe_id).first()
+    if recipe is not None:
+        fan_out_recipe(recipe)
+
+
+@task
+def fan_out_recipes_task(recipe_ids):
+    for recipe in Recipe.objects.filter(id__in=recipe_ids).iterator():
+        fan_out_recipe(recipe)
+
+
+@task
+def backfill_timeline_task(user_id, author_id):
+    # Пользователь мог успеть отписаться.
+    if Subscriptions.objects.filter(
+        user_id=user_id, following_id=author_id
+    ).exists():
+        backfill_timeline(user_id, author_id)
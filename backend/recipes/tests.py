@@ -0,0 +1,31 @@
+import io
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import TransactionTestCase
+
+from recipes.transfer import export_recipes
+
+
+class ExportRecipesTests(TransactionTestCase):
+
+    def test_export_on_new_connection_does_not_lock_writes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Режим BEGIN есть только у SQLite.')
+        test_connection = connections[DEFAULT_DB_ALIAS]
+        # Ещё не открытое соединение, как у manage.py export_recipes.
+        new_connection = connections.create_connection(DEFAULT_DB_ALIAS)
+        connections[DEFAULT_DB_ALIAS] = new_connection
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        try:
+            with new_connection.execute_wrapper(record):
+                export_recipes(io.StringIO())
+            self.assertIn('BEGIN DEFERRED', statements)
+            self.assertEqual(new_connection.transaction_mode, 'IMMEDIATE')
+        finally:
+            connections[DEFAULT_DB_ALIAS] = test_connection
+            new_connection.close()
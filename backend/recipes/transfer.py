@@ -0,0 +1,340 @@
+"""Перенос пользователей и рецептов между узлами потоком NDJSON.
+
+Строка файла — объект в формате сериализатора jsonl Django:
+{"model": "recipes.recipe", "pk": 1, "fields": {...}}, внешние ключи —
+id исходного узла. Модели идут в порядке TABLES, поэтому объект, на который
+ссылаются, всегда загружен раньше. Выгрузка читает таблицы итератором
+(серверный курсор на PostgreSQL), загрузка пишет пачками bulk_create
+и заменяет исходные id новыми. В памяти держится пачка и соответствие id.
+
+Теги, ингредиенты, пользователи и рецепты сопоставляются с существующими
+по естественному ключу, связи с уже существующими парами пропускаются.
+Производные данные (ленты, популярность, похожие рецепты) не переносятся.
+
+Файлы изображений переносятся отдельным tar-архивом.
+"""
+import gzip
+import json
+import sys
+import tarfile
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from itertools import groupby, islice
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Q
+
+from blobs.references import REFERENCES, change_references
+from recipes.changes import record_changes_on_commit
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            RecipeTag, ShoppingCart, Tag)
+from recipes.signals import recipes_changed, update_tags_mask
+from recipes.utils import PreciseJSONEncoder
+from users.models import Subscriptions, User
+
+
+class Table:
+    """Выгружаемая модель и правила её загрузки."""
+
+    def __init__(self, model, key=(), exclude=()):
+        self.model = model
+        self.label = model._meta.label_lower
+        # Поля естественного ключа, первое — самое избирательное;
+        # без ключа объект всегда создаётся.
+        self.key = key
+        self.fields = [
+            field for field in model._meta.concrete_fields
+            if not field.primary_key and field.name not in exclude
+        ]
+
+    def export(self, batch_size):
+        rows = self.model.objects.order_by('pk').values_list(
+            'pk', *(field.attname for field in self.fields)
+        )
+        for pk, *values in rows.iterator(chunk_size=batch_size):
+            yield {
+                'model': self.label,
+                'pk': pk,
+                'fields': {
+                    field.name: value
+                    for field, value in zip(self.fields, values)
+                },
+            }
+
+    def build(self, record, id_maps, renamed):
+        """Объект из записи или None, если связанный объект не перенесён."""
+        values = {}
+        for field in self.fields:
+            value = record['fields'].get(field.name)
+            if field.is_relation and value is not None:
+                value = id_maps[field.related_model._meta.label_lower].get(
+                    value
+                )
+                if value is None:
+                    return None
+            elif field.get_internal_type() in ('FileField', 'ImageField'):
+                value = renamed.get(value, value)
+            else:
+                value = field.to_python(value)
+            values[field.attname] = value
+        return self.model(**values)
+
+    def existing(self, objects):
+        """Уже сохранённые объекты с теми же ключами: {ключ: pk}."""
+        attnames = [self.model._meta.get_field(name).attname
+                    for name in self.key]
+        # Фильтр только по первому полю ключа: IN по нескольким полям
+        # перебирает все сочетания значений. Остальные сверяет key_of.
+        first = attnames[0]
+        return {
+            tuple(values[1:]): values[0]
+            for values in self.model.objects.filter(**{
+                f'{first}__in': {getattr(obj, first) for obj in objects}
+            }).values_list('pk', *attnames)
+        }
+
+    def load(self, records, id_maps, renamed, stats):
+        stats['rows'] += len(records)
+        pairs = []
+        for record in records:
+            obj = self.build(record, id_maps, renamed)
+            if obj is None:
+                stats['skipped'] += 1
+            else:
+                pairs.append((record['pk'], obj))
+        if not self.key:
+            self.created(self.model.objects.bulk_create(
+                [obj for _, obj in pairs], ignore_conflicts=True
+            ))
+            return
+        id_map = id_maps[self.label]
+        existing = self.existing([obj for _, obj in pairs])
+        new = []
+        for source_pk, obj in pairs:
+            pk = existing.get(self.key_of(obj))
+            if pk is None:
+                new.append((source_pk, obj))
+            else:
+                id_map[source_pk] = pk
+                stats['matched'] += 1
+        created = self.model.objects.bulk_create([obj for _, obj in new])
+        for source_pk, obj in new:
+            id_map[source_pk] = obj.pk
+        self.created(created)
+        stats['created'] += len(created)
+
+    def key_of(self, obj):
+        return tuple(
+            getattr(obj, self.model._meta.get_field(name).attname)
+            for name in self.key
+        )
+
+    def created(self, objects):
+        """Обработка, которую при save() выполнили бы сигналы."""
+        for model_name, field in REFERENCES:
+            if self.model._meta.label == model_name:
+                change_references(
+                    [getattr(obj, field).name for obj in objects], 1
+                )
+        if self.model is RecipeTag:
+            update_tags_mask({obj.recipe_id for obj in objects})
+        if self.model is Recipe:
+            record_changes_on_commit(obj.pk for obj in objects)
+        elif self.model in (RecipeIngredient, RecipeTag):
+            record_changes_on_commit(obj.recipe_id for obj in objects)
+
+
+TABLES = (
+    Table(Tag, key=('slug',)),
+    Table(Ingredient, key=('name', 'measurement_unit')),
+    Table(User, key=('email',)),
+    Table(Subscriptions),
+    Table(
+        Recipe,
+        key=('name', 'author'),
+        exclude=('updated_at', 'tags_mask', 'popularity'),
+    ),
+    Table(RecipeIngredient),
+    Table(RecipeTag),
+    Table(Favorite),
+    Table(ShoppingCart),
+)
+TABLES_BY_LABEL = {table.label: table for table in TABLES}
+
+
+def open_ndjson(path, mode):
+    """Файл выгрузки: '-' — stdin/stdout, *.gz — со сжатием."""
+    if path == '-':
+        return nullcontext(sys.stdin if mode == 'r' else sys.stdout)
+    if path.endswith('.gz'):
+        return gzip.open(path, f'{mode}t', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+@contextmanager
+def timed(stats, label):
+    started = time.perf_counter()
+    yield stats[label]
+    stats[label]['seconds'] += time.perf_counter() - started
+
+
+@contextmanager
+def keep_creation_dates():
+    """bulk_create не заменяет перенесённые даты создания текущим временем."""
+    fields = [
+        field for table in TABLES for field in table.fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+@contextmanager
+def read_snapshot():
+    """Один снимок на все таблицы: связи не ссылаются на объекты,
+    созданные во время выгрузки."""
+    if connection.vendor == 'sqlite':
+        # Не BEGIN IMMEDIATE: выгрузка не должна останавливать запись.
+        with connection.deferred_transactions(), transaction.atomic():
+            yield
+        return
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SET TRANSACTION ISOLATION LEVEL REPEATABLE READ'
+                )
+        yield
+
+
+def export_recipes(stream, batch_size=1000):
+    """Пишет все таблицы в stream; возвращает статистику по моделям."""
+    stats = {table.label: Counter() for table in TABLES}
+    with read_snapshot():
+        for table in TABLES:
+            with timed(stats, table.label) as table_stats:
+                for record in table.export(batch_size):
+                    stream.write(json.dumps(
+                        record, cls=PreciseJSONEncoder, ensure_ascii=False
+                    ))
+                    stream.write('\n')
+                    table_stats['rows'] += 1
+    return stats
+
+
+def read_records(stream):
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise ValueError(f'Строка {number}: {error}')
+        if record.get('model') not in TABLES_BY_LABEL:
+            raise ValueError(
+                f'Строка {number}: неизвестная модель {record.get("model")}'
+            )
+        yield record
+
+
+def import_recipes(stream, batch_size=1000, renamed=None):
+    """Загружает выгрузку из stream одной транзакцией.
+
+    renamed — новые имена файлов изображений (import_media).
+    Возвращает статистику по моделям.
+    """
+    renamed = renamed or {}
+    stats = {table.label: Counter() for table in TABLES}
+    id_maps = {table.label: {} for table in TABLES}
+    with transaction.atomic(), keep_creation_dates():
+        for label, records in groupby(
+            read_records(stream), key=lambda record: record['model']
+        ):
+            table = TABLES_BY_LABEL[label]
+            with timed(stats, label) as table_stats:
+                for batch in batched(records, batch_size):
+                    table.load(batch, id_maps, renamed, table_stats)
+        recipes_changed.send(sender=Recipe, recipe_ids=None)
+    return stats
+
+
+def format_stats(stats):
+    """Отчёт: строки, время и скорость по каждой модели."""
+    lines = []
+    for label, counts in stats.items():
+        seconds, rows = counts['seconds'], counts['rows']
+        details = ''.join(
+            f', {name} {count}' for name, count in sorted(counts.items())
+            if name not in ('seconds', 'rows')
+        )
+        lines.append(
+            f'{label}: {rows} rows{details} in {seconds:.2f}s '
+            f'({rows / seconds if seconds else 0:.0f} rows/s)'
+        )
+    return '\n'.join(lines)
+
+
+def referenced_files():
+    for model_name, field in REFERENCES:
+        names = apps.get_model(model_name).objects.exclude(
+            Q(**{field: ''}) | Q(**{f'{field}__isnull': True})
+        ).order_by(field).values_list(field, flat=True).distinct()
+        yield from names.iterator()
+
+
+def export_media(path):
+    """Пишет файлы, на которые ссылаются модели, в tar-архив path."""
+    stats = Counter()
+    with tarfile.open(path, 'w') as archive:
+        for name in referenced_files():
+            try:
+                file = default_storage.open(name)
+            except FileNotFoundError:
+                stats['missing'] += 1
+                continue
+            with file:
+                info = tarfile.TarInfo(name)
+                info.size = file.size
+                archive.addfile(info, file)
+            stats['files'] += 1
+            stats['bytes'] += info.size
+    return stats
+
+
+def import_media(path):
+    """Сохраняет файлы архива в хранилище.
+
+    Возвращает {имя в архиве: новое имя} для файлов, сохранённых
+    хранилищем под другим именем.
+    """
+    renamed = {}
+    stats = Counter()
+    with tarfile.open(path, 'r|*') as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            # Поток архива не перематывается, а хранилище читает файл
+            # дважды (хэш и запись): в памяти один файл.
+            name = default_storage.save(
+                member.name, ContentFile(archive.extractfile(member).read())
+            )
+            if name != member.name:
+                renamed[member.name] = name
+            stats['files'] += 1
+            stats['bytes'] += member.size
+    return renamed, stats
@@ -1,5 +1,48 @@
+import datetime
 import uuid
 
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from recipes.constants import MAX_TAG_MASK_BIT
+
 
 def generate_short_link():
     return uuid.uuid4().hex
+
+
+def tags_mask(tag_ids):
+    """Битовая маска тегов: бит с номером id тега.
+
+    Теги с id больше MAX_TAG_MASK_BIT в маску не попадают, фильтр по ним
+    выполняется через RecipeTag.
+    """
+    mask = 0
+    for tag_id in tag_ids:
+        if tag_id <= MAX_TAG_MASK_BIT:
+            mask |= 1 << tag_id
+    return mask
+
+
+def keyset_filter(ordering, position):
+    """Условие «строго после position» при сортировке ordering."""
+    condition = Q()
+    for index, field in enumerate(ordering):
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        equal = {
+            name.lstrip('-'): value
+            for name, value in zip(ordering[:index], position)
+        }
+        condition |= Q(
+            **equal, **{f'{field.lstrip("-")}__{lookup}': position[index]}
+        )
+    return condition
+
+
+class PreciseJSONEncoder(DjangoJSONEncoder):
+    """Даты с микросекундами: DjangoJSONEncoder округляет до миллисекунд."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)